@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import base64
+import configparser
+import hashlib
+import json
+import os
+import struct
+import sys
+from urllib.parse import parse_qsl, urlsplit
+
+from decision import observe
+from god import God
+from scheduler import Scheduler
+from stream import LENGTH
+from telemetry import MAX_PENDING, TelemetryGateway, listen
+from viewport import ViewportCache, view_args
+
+# 获取当前脚本所在路径
+current_directory = os.path.dirname(os.path.abspath(__file__))
+# 构造配置文件的路径
+config_file_path = os.path.join(current_directory, 'config/config.ini')
+
+REASONS = {101: "Switching Protocols", 200: "OK", 400: "Bad Request", 404: "Not Found"}
+# WebSocket 握手使用的固定 GUID（RFC 6455）
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_CONTINUATION, WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+# 客户端单个 WebSocket 帧的长度上限
+WS_MAX_PAYLOAD = 1 << 20
+
+
+class AsyncStation:
+    """
+    异步地面站：在同一个 asyncio 事件循环中运行锁步仿真、HTTP/WebSocket 客户端和 UDP 遥测网关，
+    不为节点或连接创建线程。每个时刻执行完毕后让出事件循环处理网络 I/O，
+    仿真状态只在事件循环线程内读写，无需加锁
+    接口与 server.py 相同（/、/nodes、/view、/stream、/alerts、/metrics），另有 /ws：
+    以 WebSocket 二进制消息推送与 /stream 相同的帧，客户端发来的二进制消息按遥测数据报处理
+    """
+
+    def __init__(self, god, telemetry_pending=MAX_PENDING):
+        """
+        :param god: 总控 God 实例，节点已初始化
+        :param telemetry_pending: 遥测缓冲区中数据报的上限
+        """
+        if god.shard_workers > 0:
+            # 分区进程启动后状态存储不能扩容，遥测节点无法加入
+            raise ValueError("异步模式不支持分区仿真，请把 [sharding] WORKERS 设为 0！")
+        if god.scheduler_mode != "lockstep":
+            print(f"异步模式总是按锁步方式调度，忽略 [scheduler] MODE = {god.scheduler_mode}", file=sys.stderr)
+        self.god = god
+        self.scheduler = Scheduler(god, period=god.delay, realtime=god.realtime)
+        self.gateway = TelemetryGateway(god, telemetry_pending)
+        self.viewports = ViewportCache()
+        self.running = False
+        self._tick = None  # 每个时刻结束时触发，等待新数据的客户端在此等待
+        self._nodes_body = (None, b"")  # (快照, /nodes 响应体)，每份快照只序列化一次
+        self.routes = {
+            "/": self._index,
+            "/nodes": self._nodes,
+            "/view": self._view,
+            "/stream": self._stream,
+            "/alerts": self._alerts,
+            "/metrics": self._metrics,
+        }
+
+    async def serve(self, host="0.0.0.0", port=5000, telemetry_host="0.0.0.0", telemetry_port=0):
+        """
+        启动 HTTP 服务和遥测监听，并在当前事件循环中运行仿真，直到 stop()
+        :param telemetry_port: UDP 遥测端口，0 表示不启用
+        """
+        self._tick = asyncio.Event()
+        server = await asyncio.start_server(self._handle, host, port)
+        listener = await listen(self.gateway, telemetry_host, telemetry_port) if telemetry_port else None
+        try:
+            await self.simulate()
+        finally:
+            if listener is not None:
+                listener.close()
+            server.close()
+            await server.wait_closed()
+
+    async def simulate(self, ticks=None):
+        """
+        在事件循环中逐个时刻推进仿真，时刻之间让出事件循环
+        :param ticks: 推进的时刻数，None 表示一直运行到 stop()
+        """
+        if self._tick is None:
+            self._tick = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self.running = True
+        start_tick = self.scheduler.tick
+        start = loop.time()
+        while self.running and (ticks is None or self.scheduler.tick - start_tick < ticks):
+            await self.scheduler.step_async({"decide": self._decide})
+            # 唤醒等待本时刻数据的客户端，之后的等待者使用新的事件
+            self._tick.set()
+            self._tick = asyncio.Event()
+            wait = 0.0
+            if self.scheduler.realtime:
+                wait = start + (self.scheduler.tick - start_tick) * self.scheduler.period - loop.time()
+            await asyncio.sleep(max(wait, 0.0))
+        self.running = False
+
+    def stop(self):
+        """停止仿真，当前时刻执行完毕后 serve() 返回"""
+        self.running = False
+
+    async def _decide(self):
+        """决策阶段：等待决策进程的结果期间让出事件循环，不阻塞客户端和遥测"""
+        god = self.god
+        if god.decision is not None:
+            god.apply_decision(await god.decision.step_async(observe(god)))
+
+    async def _next_tick(self, timeout=1.0):
+        """等待下一个时刻结束，最多 timeout 秒"""
+        try:
+            await asyncio.wait_for(self._tick.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _handle(self, reader, writer):
+        """处理一个 HTTP 连接，支持长连接上的多个请求"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                try:
+                    method, target, headers = _parse_request(head)
+                    length = int(headers.get("content-length", 0) or 0)
+                    if length < 0:
+                        raise ValueError("Content-Length 不能为负数！")
+                except ValueError:
+                    await _respond(writer, 400, b"", "text/plain")
+                    break
+                if length:
+                    await reader.readexactly(length)
+                url = urlsplit(target)
+                args = dict(parse_qsl(url.query))
+                if url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, headers)
+                    break
+                handler = self.routes.get(url.path)
+                if handler is None or method != "GET":
+                    await _respond_json(writer, 404, {"error": "接口不存在"})
+                    keep_alive = True
+                else:
+                    # 流式接口占用整个连接，返回 False
+                    keep_alive = await handler(writer, args)
+                if not keep_alive or headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # 客户端断开，或服务停止时连接被关闭
+            pass
+        finally:
+            writer.close()
+
+    async def _index(self, writer, args):
+        with open(os.path.join(current_directory, "templates", "index.html"), "rb") as f:
+            await _respond(writer, 200, f.read(), "text/html; charset=utf-8")
+        return True
+
+    async def _nodes(self, writer, args):
+        """返回最新快照中全部节点的动态信息，与 server.py 的 /nodes 相同"""
+        snapshot = self.god.snapshots.current()
+        if snapshot is None:
+            await _respond_json(writer, 200, [])
+            return True
+        cached, body = self._nodes_body
+        if cached is not snapshot:
+            body = json.dumps(snapshot.to_records()).encode()
+            self._nodes_body = (snapshot, body)
+        await _respond(writer, 200, body, "application/json")
+        return True
+
+    async def _view(self, writer, args):
+        """按矩形视口查询节点，与 server.py 的 /view 相同"""
+        snapshot = self.god.snapshots.current()
+        if snapshot is None:
+            await _respond_json(writer, 200, {"mode": "nodes", "count": 0, "nodes": []})
+            return True
+        try:
+            box = view_args(snapshot, args)
+        except ValueError:
+            await _respond_json(writer, 400, {"error": "参数格式错误"})
+            return True
+        await _respond_json(writer, 200, self.viewports.get(snapshot).query(*box))
+        return True
+
+    async def _metrics(self, writer, args):
+        await _respond(writer, 200, self.god.metrics.render().encode(), "text/plain; version=0.0.4")
+        return True
+
+    async def _stream(self, writer, args):
+        """以分块传输推送二进制帧流，每帧前加 4 字节长度，与 server.py 的 /stream 相同"""
+        try:
+            rate = float(args.get("rate", 10))
+        except ValueError:
+            rate = float("nan")
+        if not rate > 0:
+            await _respond_json(writer, 400, {"error": "rate 必须是正数"})
+            return True
+        await _start_chunked(writer, "application/octet-stream")
+        cursor = None
+        while True:
+            frames, cursor = self.god.stream.frames_since(cursor, timeout=0)
+            if frames:
+                await _write_chunk(writer, b"".join(LENGTH.pack(len(frame)) + frame for frame in frames))
+                await asyncio.sleep(1.0 / rate)
+            else:
+                await self._next_tick()
+
+    async def _alerts(self, writer, args):
+        """以分块传输推送碰撞与接近告警事件流（JSON Lines），与 server.py 的 /alerts 相同"""
+        try:
+            cursor = int(args["cursor"]) if "cursor" in args else None
+        except ValueError:
+            await _respond_json(writer, 400, {"error": "参数格式错误"})
+            return True
+        await _start_chunked(writer, "application/x-ndjson")
+        while True:
+            events, cursor = self.god.collisions.events_since(cursor, timeout=0)
+            if events:
+                await _write_chunk(writer, "".join(json.dumps(event, ensure_ascii=False) + "\n"
+                                                   for event in events).encode())
+            await self._next_tick()
+
+    async def _websocket(self, reader, writer, headers):
+        """
+        WebSocket 连接：每个时刻把新的推送帧作为二进制消息发送；
+        客户端发来的二进制消息交给遥测网关，文本消息忽略
+        """
+        key = headers.get("sec-websocket-key")
+        if key is None:
+            await _respond_json(writer, 400, {"error": "缺少 Sec-WebSocket-Key"})
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode() + WS_GUID).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+        receiving = asyncio.ensure_future(self._ws_receive(reader, writer))
+        cursor = None
+        try:
+            while not receiving.done():
+                frames, cursor = self.god.stream.frames_since(cursor, timeout=0)
+                for frame in frames:
+                    writer.write(_ws_frame(WS_BINARY, frame))
+                await writer.drain()
+                waiting = asyncio.ensure_future(self._next_tick())
+                await asyncio.wait([receiving, waiting], return_when=asyncio.FIRST_COMPLETED)
+                waiting.cancel()
+        finally:
+            receiving.cancel()
+
+    async def _ws_receive(self, reader, writer):
+        """读取客户端发来的 WebSocket 帧，收到关闭帧或连接断开时返回"""
+        try:
+            while True:
+                try:
+                    opcode, payload = await _read_ws_frame(reader)
+                except ValueError:
+                    # 分片或过长的帧：以协议错误（1002）关闭连接
+                    writer.write(_ws_frame(WS_CLOSE, struct.pack("!H", 1002)))
+                    await writer.drain()
+                    return
+                if opcode == WS_CLOSE:
+                    writer.write(_ws_frame(WS_CLOSE, payload[:2]))
+                    await writer.drain()
+                    return
+                if opcode == WS_PING:
+                    writer.write(_ws_frame(WS_PONG, payload))
+                elif opcode == WS_BINARY:
+                    self.gateway.receive(payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+
+
+def _parse_request(head):
+    """解析 HTTP 请求头，返回 (方法, 请求目标, 小写键名的头部字典)"""
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+async def _respond(writer, status, body, content_type):
+    writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+
+
+async def _respond_json(writer, status, value):
+    await _respond(writer, status, json.dumps(value).encode(), "application/json")
+
+
+async def _start_chunked(writer, content_type):
+    writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nTransfer-Encoding: chunked\r\n\r\n".encode())
+    await writer.drain()
+
+
+async def _write_chunk(writer, data):
+    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+    await writer.drain()
+
+
+def _ws_frame(opcode, payload):
+    """编码一个服务器发往客户端的 WebSocket 帧（不加掩码）"""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def _read_ws_frame(reader):
+    """
+    读取一个客户端发来的 WebSocket 帧，返回 (操作码, 去掉掩码后的数据)
+    不支持分片的消息：FIN 位未置位或操作码为延续帧（0x0）时抛出 ValueError
+    """
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    if not first & 0x80 or opcode == WS_CONTINUATION:
+        raise ValueError("不支持分片的 WebSocket 消息！")
+    n = second & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if n > WS_MAX_PAYLOAD:
+        raise ValueError("WebSocket 帧过长！")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask is not None:
+        key = int.from_bytes((mask * (n // 4 + 1))[:n], "little")
+        payload = (int.from_bytes(payload, "little") ^ key).to_bytes(n, "little")
+    return opcode, payload
+
+
+if __name__ == '__main__':
+    config = configparser.ConfigParser()
+    config.read(config_file_path)
+    parser = argparse.ArgumentParser(description="无人机地面站（异步模式）：仿真、HTTP/WebSocket 客户端和 UDP 遥测网关共用一个事件循环")
+    parser.add_argument("--host", default="0.0.0.0", help="HTTP 监听地址")
+    parser.add_argument("--port", type=int, default=5000, help="HTTP 监听端口")
+    parser.add_argument("--telemetry-host", default=config.get("telemetry", "HOST", fallback="0.0.0.0"),
+                        help="UDP 遥测监听地址")
+    parser.add_argument("--telemetry-port", type=int, default=int(config.get("telemetry", "PORT", fallback="0")),
+                        help="UDP 遥测监听端口，0 表示不启用")
+    parser.add_argument("--scenario", help="场景文件（.csv/.txt/.npy/.npz），默认随机生成红蓝双方各 25 个节点")
+    args = parser.parse_args()
+    god = God()
+    if args.scenario:
+        god.init_scenario(args.scenario)
+    else:
+        god.init_nodes("random", "blue", 25, (0, 10), (0, 10), (0, 1), (0, 1), (0, 0.1), (0, 0.1))
+        god.init_nodes("random", "red", 25, (150, 140), (150, 150), (-1, 0), (-1, 0), (-0.1, 0), (-0.1, 0))
+    station = AsyncStation(god, int(config.get("telemetry", "MAX_PENDING", fallback=str(MAX_PENDING))))
+    try:
+        asyncio.run(station.serve(args.host, args.port, args.telemetry_host, args.telemetry_port))
+    except KeyboardInterrupt:
+        pass
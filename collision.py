@@ -0,0 +1,186 @@
+import collections
+import threading
+
+import numpy as np
+
+from spatial import make_index
+from state import CAMP_NAMES, FREE
+
+
+def swept_pairs(start, end, distance, engine="grid"):
+    """
+    连续碰撞检测：假设每个节点在两个时刻之间沿直线匀速运动，找出这段时间内最近距离小于 distance 的节点对
+    只比较两个时刻的位置会漏掉步长较大时相互穿过的节点，这里对每个候选节点对求相对运动轨迹上的最近点。
+    网格边长固定为 distance，位移不超过 distance 的节点（慢速节点）之间在轨迹中点上按
+    distance 加上慢速节点最大位移查询；位移更大的快速节点按各自轨迹的包围盒批量查询，
+    快速节点放入按其轨迹包围盒大小划分的单独网格，不会因为快速节点把全体节点的网格和查询半径一起放大
+    :param start: 上一时刻的节点位置，形状为 (N, 2)
+    :param end: 当前时刻的节点位置，形状为 (N, 2)
+    :param distance: 安全距离
+    :param engine: 空间索引引擎，"grid" 或 "brute"
+    :return: (i 下标数组, j 下标数组, 最近距离, 最近时刻在本时间段内的比例 0~1)，满足 i < j
+    """
+    start = np.asarray(start, dtype=float).reshape(-1, 2)
+    end = np.asarray(end, dtype=float).reshape(-1, 2)
+    first, second = _swept_candidates(start, end, distance, engine)
+    moves = end - start
+
+    # 相对位置 d(t) = d0 + v * t，t ∈ [0, 1]，最近时刻 t* = clip(-(d0·v) / (v·v), 0, 1)
+    d0 = start[second] - start[first]
+    v = moves[second] - moves[first]
+    vv = v[:, 0] ** 2 + v[:, 1] ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(vv > 0, -(d0[:, 0] * v[:, 0] + d0[:, 1] * v[:, 1]) / vv, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    closest = d0 + v * t[:, None]
+    gap = np.sqrt(closest[:, 0] ** 2 + closest[:, 1] ** 2)
+    hit = gap < distance
+    return first[hit], second[hit], gap[hit], t[hit]
+
+
+def _swept_candidates(start, end, distance, engine):
+    """
+    找出这段时间内可能接近到 distance 以内的候选节点对（精确结果的超集）
+    节点在这段时间内不会离开轨迹中点 位移/2 以外，因此两个节点的轨迹中点距离不超过
+    distance + (位移1 + 位移2) / 2 时才需要计算最近距离
+    :return: (i, j) 两个下标数组，满足 i < j，按 (i, j) 排序
+    """
+    moves = end - start
+    length = np.sqrt(moves[:, 0] ** 2 + moves[:, 1] ** 2)
+    fast = np.flatnonzero(length > distance)
+    slow = np.flatnonzero(length <= distance)
+
+    index = make_index(engine, distance)
+    index.build((start[slow] + end[slow]) / 2)
+    slow_reach = float(length[slow].max()) if len(slow) else 0.0
+    first, second = index.query_pairs(distance + slow_reach)
+    firsts, seconds = [slow[first]], [slow[second]]
+
+    if len(fast):
+        # 快速节点的轨迹包围盒各向外扩展 distance / 2：两条轨迹接近到 distance 以内时，扩展后的包围盒必然相交。
+        # 快速节点的包围盒按中心放入单独的网格，边长取最大的包围盒边长，
+        # 两个相交的包围盒中心在每个方向上相差不超过一个格子，只需查询相邻格子
+        low = np.minimum(start, end) - distance / 2
+        high = np.maximum(start, end) + distance / 2
+        centers, extents = (low + high) / 2, high - low
+        cell = float(extents[fast].max())
+        boxes = make_index(engine, cell)
+        boxes.build(centers[fast])
+
+        # 快速节点之间（每对只比较一次）
+        qi, ci = boxes.query_candidates(centers[fast], cell)
+        keep = qi < ci
+        qi, ci = fast[qi[keep]], fast[ci[keep]]
+        hit = _boxes_overlap(low, high, qi, ci)
+        firsts.append(qi[hit])
+        seconds.append(ci[hit])
+
+        # 慢速节点与快速节点
+        if len(slow):
+            radius = (cell + float(extents[slow].max())) / 2
+            qi, ci = boxes.query_candidates(centers[slow], radius)
+            qi, ci = slow[qi], fast[ci]
+            hit = _boxes_overlap(low, high, qi, ci)
+            firsts.append(qi[hit])
+            seconds.append(ci[hit])
+
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    first, second = np.minimum(first, second), np.maximum(first, second)
+    order = np.lexsort((second, first))
+    return first[order], second[order]
+
+
+def _boxes_overlap(low, high, first, second):
+    """两组包围盒是否相交（逐对比较）"""
+    return ((low[first, 0] <= high[second, 0]) & (low[second, 0] <= high[first, 0])
+            & (low[first, 1] <= high[second, 1]) & (low[second, 1] <= high[first, 1]))
+
+
+class CollisionMonitor:
+    """
+    碰撞与接近告警
+    每个时刻对红蓝双方全部节点做一次连续碰撞检测，节点对的最近距离小于安全距离时产生 "alert" 事件，
+    告警中的节点对重新拉开到安全距离以外时产生 "clear" 事件。告警中的节点对按
+    (较小行号 << 32) | 较大行号 编码保存，与邻居关系的编码方式相同。
+    事件放在环形队列中，订阅者按序号增量读取
+    """
+
+    def __init__(self, safety_distance, engine="grid", capacity=10000):
+        """
+        :param safety_distance: 安全距离
+        :param engine: 空间索引引擎，"grid" 或 "brute"
+        :param capacity: 事件队列最多保留的事件数
+        """
+        self.safety_distance = safety_distance
+        self.engine = engine
+        self.alerts = np.empty(0, dtype=np.int64)
+        self._prev = None  # 上一次检测时的节点位置
+        self._events = collections.deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._seq = 0
+
+    def check(self, state, sim_time):
+        """
+        检测上一次调用以来全部节点的运动轨迹，生成告警事件
+        :param state: FleetState 状态存储
+        :param sim_time: 仿真时间
+        :return: 本次产生的事件列表
+        """
+        size = state.size
+        end = state.pos[:size].copy()
+        start = end.copy()
+        if self._prev is not None:
+            # 新增的节点没有上一时刻位置，按静止处理
+            known = min(len(self._prev), size)
+            start[:known] = self._prev[:known]
+        self._prev = end
+
+        active = np.flatnonzero(state.camp[:size] != FREE)
+        first, second, gap, toi = swept_pairs(start[active], end[active], self.safety_distance, self.engine)
+        first, second = active[first].astype(np.int64), active[second].astype(np.int64)
+        keys = (first << 32) | second
+        order = np.argsort(keys)
+        keys, gap, toi = keys[order], gap[order], toi[order]
+
+        raised = ~np.isin(keys, self.alerts)
+        cleared = np.setdiff1d(self.alerts, keys, assume_unique=True)
+        self.alerts = keys
+
+        events = []
+        for key, distance, fraction in zip(keys[raised].tolist(), gap[raised].tolist(), toi[raised].tolist()):
+            events.append(self._event(state, "alert", sim_time, key, distance, fraction))
+        for key in cleared.tolist():
+            events.append(self._event(state, "clear", sim_time, key))
+        if events:
+            with self._cond:
+                for event in events:
+                    event["seq"] = self._seq
+                    self._seq += 1
+                    self._events.append(event)
+                self._cond.notify_all()
+        return events
+
+    @staticmethod
+    def _event(state, kind, sim_time, key, distance=None, fraction=None):
+        a, b = key >> 32, key & 0xFFFFFFFF
+        return {
+            "event": kind,
+            "time": sim_time,
+            "nodes": [[CAMP_NAMES.get(int(state.camp[row]), "free"), int(state.node_id[row])] for row in (a, b)],
+            "distance": distance,
+            "fraction": fraction,
+        }
+
+    def events_since(self, cursor, timeout=None):
+        """
+        取出某个订阅者尚未收到的事件，没有新事件时最多等待 timeout 秒
+        :param cursor: 订阅者已收到的最后一个事件序号，None 表示从队列中最早的事件开始
+        :param timeout: 最长等待时间（秒）
+        :return: (事件列表, 新的 cursor)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._events and (cursor is None or self._events[-1]["seq"] > cursor),
+                                       timeout=timeout):
+                return [], cursor
+            pending = [event for event in self._events if cursor is None or event["seq"] > cursor]
+            return pending, pending[-1]["seq"]
@@ -0,0 +1,304 @@
+import asyncio
+import concurrent.futures
+import itertools
+import multiprocessing
+
+import numpy as np
+
+
+class Observation:
+    """
+    全体节点某一时刻的观测，全部以数组保存，供决策算法批量计算
+    邻居表和探测结果是变长的，用 CSR 格式保存：第 k 个节点的邻居为
+    neighbor_ids[neighbor_offsets[k]:neighbor_offsets[k + 1]]，探测结果同理
+    """
+
+    def __init__(self, sim_time, rows, node_ids, camps, pos, vel, acc,
+                 neighbor_offsets, neighbor_ids, neighbor_pos, neighbor_vel,
+                 detected_offsets, detected_ids, detected_pos, detected_vel):
+        """
+        :param sim_time: 仿真时间
+        :param rows: 节点在状态存储中的行号，长度为 N
+        :param node_ids: 节点ID
+        :param camps: 阵营编码
+        :param pos: 节点位置，形状为 (N, 2)
+        :param vel: 节点速度，形状为 (N, 2)
+        :param acc: 节点当前加速度，形状为 (N, 2)
+        :param neighbor_offsets: 邻居表的分段偏移，长度为 N + 1
+        :param neighbor_ids: 邻居节点ID（来自邻居表，即邻居最近一次发来的消息）
+        :param neighbor_pos: 邻居消息中的位置，形状为 (M, 2)
+        :param neighbor_vel: 邻居消息中的速度，形状为 (M, 2)
+        :param detected_offsets: 探测结果的分段偏移，长度为 N + 1
+        :param detected_ids: 探测到的敌方节点ID
+        :param detected_pos: 探测到的敌方节点位置，形状为 (K, 2)
+        :param detected_vel: 探测到的敌方节点速度，形状为 (K, 2)
+        """
+        self.time = sim_time
+        self.rows = rows
+        self.node_ids = node_ids
+        self.camps = camps
+        self.pos = pos
+        self.vel = vel
+        self.acc = acc
+        self.neighbor_offsets = neighbor_offsets
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_pos = neighbor_pos
+        self.neighbor_vel = neighbor_vel
+        self.detected_offsets = detected_offsets
+        self.detected_ids = detected_ids
+        self.detected_pos = detected_pos
+        self.detected_vel = detected_vel
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def owners(offsets):
+        """把分段偏移展开为每一项所属的节点下标"""
+        return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def observe(god):
+    """
+    从 God 收集全部节点的观测
+    :param god: 总控 God 实例
+    :return: Observation
+    """
+    nodes = god.blue_nodes + god.red_nodes
+    rows = np.array([node.row for node in nodes], dtype=np.intp)
+    tables = {"neighbor": [], "detected": []}
+    for node in nodes:
+        with node._lock:
+            tables["neighbor"].append(list(node.neighbor_table.items()))
+            tables["detected"].append(list(node.detected_targets.items()))
+    arrays = {}
+    for name, entries in tables.items():
+        counts = [len(items) for items in entries]
+        total = sum(counts)
+        infos = [info for items in entries for _, info in items]
+        if name == "neighbor":
+            # 邻居表中保存的是消息总线的投递记录，状态分量在其中的消息里
+            infos = [info.message for info in infos]
+        arrays[name] = (np.concatenate(([0], np.cumsum(counts, dtype=np.int64))),
+                        np.fromiter((key for items in entries for key, _ in items), dtype=np.int64, count=total),
+                        _pairs(((info.x, info.y) for info in infos), total),
+                        _pairs(((info.vx, info.vy) for info in infos), total))
+    return Observation(god.now(), rows, god.state.node_id[rows], god.state.camp[rows],
+                       god.state.pos[rows], god.state.vel[rows], god.state.acc[rows],
+                       *arrays["neighbor"], *arrays["detected"])
+
+
+def _pairs(vectors, n):
+    """把 n 个二维向量（列表）拼接为形状为 (n, 2) 的数组"""
+    return np.fromiter(itertools.chain.from_iterable(vectors), dtype=float, count=2 * n).reshape(n, 2)
+
+
+class Policy:
+    """
+    决策算法接口：每个时刻以全体节点的观测调用一次 decide()，一次返回全部节点的加速度指令
+    自定义算法继承此类并注册到 POLICIES；在进程池中运行时，算法对象需要可以被 pickle
+    """
+
+    def decide(self, observation):
+        """
+        :param observation: Observation
+        :return: 全部节点的加速度指令，形状为 (N, 2)，与 observation 的节点顺序一致；返回 None 表示不改变
+        """
+        raise NotImplementedError
+
+
+class HoldPolicy(Policy):
+    """保持当前加速度不变"""
+
+    def decide(self, observation):
+        return None
+
+
+class PursuitPolicy(Policy):
+    """
+    追击示例：探测到敌方的节点朝探测目标的质心加速，同时向邻居的质心靠拢；
+    没有探测到敌方的节点保持当前加速度
+    """
+
+    def __init__(self, gain=0.1, cohesion=0.02):
+        """
+        :param gain: 追击加速度大小
+        :param cohesion: 向邻居靠拢的加速度大小
+        """
+        self.gain = gain
+        self.cohesion = cohesion
+
+    @staticmethod
+    def _toward_centroid(observation, offsets, points):
+        """每个节点指向分段内各点质心的单位向量，没有点的节点为 0"""
+        n = len(observation)
+        owners = Observation.owners(offsets)
+        counts = np.diff(offsets)
+        has = counts > 0
+        centroid = np.zeros((n, 2))
+        for axis in range(2):
+            centroid[:, axis] = np.bincount(owners, weights=points[:, axis], minlength=n)
+        centroid[has] /= counts[has, None]
+        direction = np.where(has[:, None], centroid - observation.pos, 0.0)
+        norm = np.sqrt(direction[:, 0] ** 2 + direction[:, 1] ** 2)
+        moving = norm > 0
+        direction[moving] /= norm[moving, None]
+        return direction, has
+
+    def decide(self, observation):
+        pursue, engaged = self._toward_centroid(observation, observation.detected_offsets, observation.detected_pos)
+        group, _ = self._toward_centroid(observation, observation.neighbor_offsets, observation.neighbor_pos)
+        commands = np.array(observation.acc, dtype=float)
+        commands[engaged] = self.gain * pursue[engaged] + self.cohesion * group[engaged]
+        return commands
+
+
+# 决策算法名称 -> 类，可在 config.ini 的 POLICY 中使用
+POLICIES = {
+    "hold": HoldPolicy,
+    "pursuit": PursuitPolicy,
+}
+
+
+def register_policy(name, policy_class):
+    """
+    注册自定义决策算法
+    :param name: 算法名称
+    :param policy_class: Policy 的子类，无参构造
+    """
+    POLICIES[name] = policy_class
+
+
+def make_policy(name):
+    """根据名称创建决策算法"""
+    if name not in POLICIES:
+        raise ValueError(f"未知的决策算法: {name}")
+    return POLICIES[name]()
+
+
+# decision_misses 计数器的说明
+_MISS_HELP = "本时刻没有新的决策结果、沿用上一次指令的次数"
+
+
+def _decide(policy, observation):
+    return policy.decide(observation)
+
+
+class DecisionEngine:
+    """
+    决策调度：每个时刻把观测交给决策算法，取回全部节点的加速度指令
+    workers 为 0 时在仿真线程内直接计算；大于 0 时在单独的决策进程中计算，并等待至多 deadline 秒，
+    超时则本时刻不下发新指令，节点继续执行上一次的加速度指令。
+    同一时间只有一个计算在进行，计算未完成前不会提交新的观测，因此只使用一个决策进程；
+    超时的计算在下一个时刻完成时仍然下发，更晚完成的结果已经落后一个时刻以上，直接丢弃并提交新的观测。
+    决策算法抛出异常时本时刻同样沿用上一次的指令，异常保存在 last_error 中
+    """
+
+    def __init__(self, policy, workers=0, deadline=0.5, metrics=None):
+        """
+        :param policy: Policy 实例
+        :param workers: 大于 0 表示在决策进程中计算，0 表示在仿真线程内计算
+        :param deadline: 每个时刻等待决策结果的最长时间（秒）
+        :param metrics: 可选的 Metrics，用于统计超时、过期和出错次数
+        """
+        self.policy = policy
+        self.deadline = deadline
+        self.metrics = metrics
+        self.last_error = None
+        self._pool = None
+        self._pending = None  # (提交时的时刻序号, 行号, 尚未完成的计算)
+        self._tick = 0  # step() 的调用次数，每个时刻调用一次
+        if workers > 0:
+            self._pool = concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+
+    def step(self, observation):
+        """
+        提交本时刻的观测并取回决策结果，等待结果期间阻塞调用线程
+        :param observation: Observation
+        :return: (行号, 加速度指令)，本时刻没有新指令时返回 None
+        """
+        future = self._begin(observation)
+        if future is None:
+            return self._inline(observation)
+        try:
+            commands = future.result(timeout=self.deadline)
+        except concurrent.futures.TimeoutError:
+            return self._missed()
+        except Exception as e:
+            self._pending = None
+            return self._failed(e)
+        return self._finish(observation, commands)
+
+    async def step_async(self, observation):
+        """
+        与 step() 相同，在事件循环中调用：等待决策进程的结果期间让出事件循环，不阻塞网络 I/O
+        :param observation: Observation
+        :return: (行号, 加速度指令)，本时刻没有新指令时返回 None
+        """
+        future = self._begin(observation)
+        if future is None:
+            return self._inline(observation)
+        try:
+            # shield 保证等待超时不会取消决策进程中的计算，计算完成后在之后的时刻取回
+            commands = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.deadline)
+        except asyncio.TimeoutError:
+            return self._missed()
+        except Exception as e:
+            self._pending = None
+            return self._failed(e)
+        return self._finish(observation, commands)
+
+    def _begin(self, observation):
+        """进入新的时刻，必要时提交观测；返回尚未取回的计算，在仿真线程内计算时返回 None"""
+        self._tick += 1
+        if self._pool is None:
+            return None
+        if self._pending is None:
+            self._submit(observation)
+        return self._pending[2]
+
+    def _inline(self, observation):
+        try:
+            return self._result(observation.rows, self.policy.decide(observation))
+        except Exception as e:
+            return self._failed(e)
+
+    def _missed(self):
+        self._count("decision_misses", _MISS_HELP)
+        return None
+
+    def _finish(self, observation, commands):
+        """取回已完成的计算，结果落后一个时刻以上时丢弃，并提交本时刻的观测"""
+        submitted, rows, _ = self._pending
+        self._pending = None
+        if self._tick - submitted > 1:
+            self._count("decision_stale", "决策结果落后一个时刻以上而被丢弃的次数")
+            self._submit(observation)
+            return self._missed()
+        return self._result(rows, commands)
+
+    def _submit(self, observation):
+        self._pending = (self._tick, observation.rows, self._pool.submit(_decide, self.policy, observation))
+
+    def _failed(self, error):
+        """决策算法出错：记录异常，本时刻沿用上一次的指令"""
+        self.last_error = error
+        self._count("decision_errors", "决策算法抛出异常的次数")
+        return self._missed()
+
+    def _count(self, name, help_text):
+        if self.metrics is not None:
+            self.metrics.inc(name, help_text=help_text)
+
+    @staticmethod
+    def _result(rows, commands):
+        if commands is None:
+            return None
+        commands = np.asarray(commands, dtype=float).reshape(len(rows), 2)
+        return rows, commands
+
+    def close(self):
+        """关闭决策进程"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,89 @@
+import numpy as np
+
+from spatial import make_index
+
+# 探测扇区半角的余弦值，cos(30°) ≈ 0.866，与 Node.detect_enemy 一致
+COS_HALF_ANGLE = 0.866
+
+
+def _unit_headings(velocities):
+    """
+    计算每个节点前进方向的单位向量
+    :return: (单位向量, 是否有速度)，速度为 0 的节点方向未定义，不参与探测
+    """
+    speed = np.sqrt(velocities[:, 0] ** 2 + velocities[:, 1] ** 2)
+    moving = speed > 0
+    units = np.zeros_like(velocities)
+    units[moving] = velocities[moving] / speed[moving, None]
+    return units, moving
+
+
+def _in_sector(units, moving, delta, distance, radius, cos_half_angle):
+    """
+    扇区判定：目标在探测半径以内，且与前进方向夹角不超过扇区半角
+    """
+    hit = moving & (distance <= radius) & (distance > 0)
+    dot_product = delta[:, 0] * units[:, 0] + delta[:, 1] * units[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_theta = dot_product / distance
+    return hit & (cos_theta >= cos_half_angle)
+
+
+def detect_pairs(pos_a, vel_a, pos_b, vel_b, radius,
+                 cos_half_angle=COS_HALF_ANGLE, engine="grid"):
+    """
+    批量敌方探测：一次计算 a、b 两个阵营互相探测到的全部目标
+    先用空间索引按探测半径筛选候选节点对，再用向量化点积做 ±30° 扇区判定，
+    计算量与候选节点对数成正比，而不是与 a、b 节点数的乘积成正比
+    :param pos_a: a 阵营节点位置，形状为 (A, 2)
+    :param vel_a: a 阵营节点速度，形状为 (A, 2)
+    :param pos_b: b 阵营节点位置，形状为 (B, 2)
+    :param vel_b: b 阵营节点速度，形状为 (B, 2)
+    :param radius: 探测半径
+    :param cos_half_angle: 扇区半角的余弦值
+    :param engine: 空间索引引擎，"grid" 或 "brute"
+    :return: (a 探测到 b 的节点对, b 探测到 a 的节点对)，每个节点对为 (a 下标数组, b 下标数组)
+    """
+    pos_a = np.asarray(pos_a, dtype=float).reshape(-1, 2)
+    vel_a = np.asarray(vel_a, dtype=float).reshape(-1, 2)
+    pos_b = np.asarray(pos_b, dtype=float).reshape(-1, 2)
+    vel_b = np.asarray(vel_b, dtype=float).reshape(-1, 2)
+
+    index = make_index(engine, radius)
+    index.build(pos_b)
+    ia, ib = index.query_candidates(pos_a, radius)
+
+    # 候选节点对的相对向量和距离，两个方向共用
+    delta = pos_b[ib] - pos_a[ia]
+    distance = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+
+    units_a, moving_a = _unit_headings(vel_a)
+    units_b, moving_b = _unit_headings(vel_b)
+    a_hits = _in_sector(units_a[ia], moving_a[ia], delta, distance, radius, cos_half_angle)
+    b_hits = _in_sector(units_b[ib], moving_b[ib], -delta, distance, radius, cos_half_angle)
+    return (ia[a_hits], ib[a_hits]), (ib[b_hits], ia[b_hits])
+
+
+def detect_targets(pos_a, vel_a, pos_b, radius, cos_half_angle=COS_HALF_ANGLE, engine="grid"):
+    """
+    单向批量探测：计算 a 中每个节点探测到的 b 中的目标
+    :param pos_a: 探测方节点位置，形状为 (A, 2)
+    :param vel_a: 探测方节点速度，形状为 (A, 2)
+    :param pos_b: 目标节点位置，形状为 (B, 2)
+    :param radius: 探测半径
+    :param cos_half_angle: 扇区半角的余弦值
+    :param engine: 空间索引引擎，"grid" 或 "brute"
+    :return: (探测方下标数组, 目标下标数组)
+    """
+    pos_a = np.asarray(pos_a, dtype=float).reshape(-1, 2)
+    vel_a = np.asarray(vel_a, dtype=float).reshape(-1, 2)
+    pos_b = np.asarray(pos_b, dtype=float).reshape(-1, 2)
+
+    index = make_index(engine, radius)
+    index.build(pos_b)
+    ia, ib = index.query_candidates(pos_a, radius)
+    delta = pos_b[ib] - pos_a[ia]
+    distance = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+    units_a, moving_a = _unit_headings(vel_a)
+    hits = _in_sector(units_a[ia], moving_a[ia], delta, distance, radius, cos_half_angle)
+    return ia[hits], ib[hits]
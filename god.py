@@ -1,11 +1,30 @@
 import configparser
+import itertools
+import logging
 import math
 import os
 import random
 import threading
 import time
 
-from node_t import Node
+import numpy as np
+
+from collision import CollisionMonitor
+from decision import DecisionEngine, make_policy, observe
+from detection import detect_pairs
+from log_sink import LogSink, parse_level
+from message_bus import MessageBus
+from metrics import Metrics
+from model import Model
+from node_t import NO_TARGETS, Message, Node, TargetRecord, log_directory
+from recorder import RunRecorder
+from scenario import load_scenario, load_text, random_scenario
+from scheduler import Scheduler
+from sharding import ShardedEngine
+from snapshot import SnapshotBuffer
+from spatial import make_index
+from state import CAMP_CODES, FREE, FleetState
+from stream import FrameStream
 
 # 获取当前脚本所在路径
 current_directory = os.path.dirname(os.path.abspath(__file__))
@@ -13,14 +32,114 @@ current_directory = os.path.dirname(os.path.abspath(__file__))
 config_file_path = os.path.join(current_directory, 'config/config.ini')
 
 class God:
-    def __init__(self):
-        self.blue_nodes = []
-        self.red_nodes = []
+    def __init__(self, seed=None, overrides=None):
+        """
+        :param seed: 随机种子，None 时使用配置文件中的 SEED
+        :param overrides: 覆盖配置文件的参数 {(节名, 键名): 值}，用于批量实验
+        """
+        self._nodes = {"blue": [], "red": []}  # 阵营 -> 节点列表
+        # 批量初始化时延迟创建的节点：阵营 -> (节点ID列表, 行号列表)，首次访问该阵营的节点列表时才创建节点对象
+        self._deferred = {}
+        self._deferred_lock = threading.Lock()
+        self.state = FleetState()  # 全部节点的集中式状态存储
         self.neighbor_distance = 2.0
         config = configparser.ConfigParser()
         config.read(config_file_path)
+        for (section, key), value in (overrides or {}).items():
+            if not config.has_section(section):
+                config.add_section(section)
+            config.set(section, key, str(value))
         self.neighbor_distance = float(config.get("threshold_distance", "NEIGHBOR_DISTANCE"))
         self.enemy_distance = float(config.get("threshold_distance", "ENEMY_DISTANCE"))
+        self.detect_radius = float(config.get("detect_radius", "DETECT_RADIUS"))
+        # 节点发送周期，锁步调度时即每个时刻对应的仿真时间
+        self.delay = float(config.get("send_delay", "DELAY"))
+        # 邻居关系的滞回比例：距离小于 neighbor_distance 时建立邻居关系，
+        # 超过 neighbor_distance * (1 + 滞回比例) 时才断开，避免在临界距离附近反复抖动
+        hysteresis = float(config.get("threshold_distance", "NEIGHBOR_HYSTERESIS", fallback="0"))
+        self.link_distance = self.neighbor_distance * (1 + hysteresis)
+        # 各阵营当前的邻居关系，每条边编码为 (较小行号 << 32) | 较大行号，按升序保存
+        self.links = {}
+        # 行号 -> 节点，用于把邻居关系的变化下发到对应节点
+        self.nodes_by_row = {}
+        # 上一次探测时有探测结果的节点行号
+        self._detecting = set()
+        # 邻居查询引擎："grid" 为哈希网格，"brute" 为暴力遍历（参考模式）
+        self.neighbor_engine = config.get("neighbor_engine", "ENGINE", fallback="grid")
+        # 调度方式："threaded" 为每个节点一个线程，"lockstep" 为单线程锁步调度
+        self.scheduler_mode = config.get("scheduler", "MODE", fallback="threaded")
+        if self.scheduler_mode not in ("threaded", "lockstep"):
+            raise ValueError(f"未知的调度方式: {self.scheduler_mode}")
+        self.realtime = config.getboolean("scheduler", "REALTIME", fallback=True)
+        if seed is None and config.get("scheduler", "SEED", fallback=""):
+            seed = int(config.get("scheduler", "SEED"))
+        # 可设定种子的随机数发生器，保证随机初始化和仿真过程可复现
+        self.rng = random.Random(seed)
+        # 仿真时钟，锁步调度时由调度器替换为仿真时间
+        self.clock = time.time
+        self.scheduler = None
+        # 遥测网关，接入外部节点时由 telemetry.TelemetryGateway 设置
+        self.telemetry = None
+        # 运动模型：积分器、子步数和速度、加速度限制
+        self.model = Model(integrator=config.get("model", "INTEGRATOR", fallback="euler"),
+                           substeps=int(config.get("model", "SUBSTEPS", fallback="1")),
+                           max_speed=float(config.get("model", "MAX_SPEED", fallback="0")),
+                           max_accel=float(config.get("model", "MAX_ACCEL", fallback="0")))
+        # 分区仿真的工作进程数，大于0时锁步调度由多个进程并行完成运动计算和感知
+        self.shard_workers = int(config.get("sharding", "WORKERS", fallback="0"))
+        if self.shard_workers < 0:
+            raise ValueError("分区进程数不能为负数！")
+        self.shards = None
+        # 消息总线：按链路时延、扰动、丢包和带宽限制投递节点间消息
+        self.bus = MessageBus(latency=float(config.get("message_bus", "LATENCY", fallback="0")),
+                              jitter=float(config.get("message_bus", "JITTER", fallback="0")),
+                              loss=float(config.get("message_bus", "LOSS", fallback="0")),
+                              bandwidth=int(config.get("message_bus", "BANDWIDTH", fallback="0")),
+                              rng=self.rng)
+        # 共享日志汇：全部节点的消息日志写入同一个 JSON Lines 文件
+        self.log_sink = LogSink(os.path.join(log_directory, "messages.jsonl"),
+                                level=parse_level(config.get("logging", "LEVEL", fallback="DEBUG")),
+                                max_pending=int(config.get("logging", "MAX_PENDING", fallback="100000")))
+        # 全局只读快照，供 HTTP 接口、日志和分析模块无锁读取
+        self.snapshots = SnapshotBuffer()
+        # 运行记录器，配置了记录文件路径时把每个时刻的快照写入列式文件，供事后回放
+        record_path = config.get("recorder", "PATH", fallback="")
+        self.recorder = RunRecorder(os.path.join(current_directory, record_path)) if record_path else None
+        # 节点状态推送流，每个时刻发布一帧，供前端订阅
+        self.stream = FrameStream(keyframe_interval=int(config.get("stream", "KEYFRAME_INTERVAL", fallback="50")))
+        # 碰撞与接近告警：任意两个节点的运动轨迹接近到 ENEMY_DISTANCE 以内时产生告警事件
+        self.collisions = CollisionMonitor(self.enemy_distance, self.neighbor_engine)
+        # 运行指标：各阶段耗时和计数器，关闭时热路径上几乎没有开销
+        self.metrics = Metrics(enabled=config.getboolean("metrics", "ENABLED", fallback=True))
+        self._register_metrics()
+        # 决策模块：每个时刻以全体节点的观测调用一次决策算法，未配置算法时不启用
+        policy = config.get("decision", "POLICY", fallback="")
+        self.decision = None
+        if policy:
+            self.decision = DecisionEngine(make_policy(policy),
+                                           workers=int(config.get("decision", "WORKERS", fallback="0")),
+                                           deadline=float(config.get("decision", "DEADLINE", fallback="")
+                                                          or self.delay / 2),
+                                           metrics=self.metrics)
+
+    def _register_metrics(self):
+        """注册抓取时才读取的指标：消息统计、队列长度、节点数和线程数"""
+        bus = self.bus
+        self.metrics.register("messages_sent", lambda: bus.sent, "已发送的消息数", kind="counter")
+        self.metrics.register("messages_delivered", lambda: bus.delivered, "已投递的消息数", kind="counter")
+        self.metrics.register("messages_dropped", lambda: bus.dropped, "丢包的消息数", kind="counter")
+        self.metrics.register("bus_pending", bus.pending, "消息总线中尚未投递的消息数")
+        self.metrics.register("log_queue_depth", self.log_sink.pending, "日志队列中尚未写入的记录数")
+        self.metrics.register("log_dropped", lambda: self.log_sink.dropped, "日志队列已满而丢弃的记录数",
+                              kind="counter")
+        self.metrics.register("nodes", lambda: len(self.blue_nodes) + len(self.red_nodes), "节点数")
+        self.metrics.register("threads", threading.active_count, "当前线程数")
+        self.metrics.register("tick", lambda: self.scheduler.tick if self.scheduler is not None else 0,
+                              "锁步调度已推进的时刻数", kind="counter")
+
+    def now(self):
+        """返回当前仿真时间"""
+        return self.clock()
 
     @staticmethod
     def calculate_distance(position1, position2):
@@ -39,7 +158,8 @@ class God:
         """
         根据不同的方法初始化节点，包括随机初始化和从文件中读取初始化
         参数说明
-        :param method: “random”表示按照给定的位置、速度和加速度边界值随机生成，“file”表示从文件创造节点
+        :param method: “random”表示按照给定的位置、速度和加速度边界值随机生成，“bulk”与“random”相同但批量生成，
+                       “file”表示从文件创造节点
         :param camp: 节点的阵营，包括“blue”和“red”
         :param n: 随机生成时需要创建的节点个数
         :param x_range: 节点的x坐标范围
@@ -58,16 +178,24 @@ class God:
                 raise ValueError("随机创建节点时，需要指定阵营！")
             for i in range(n):
                 node_id = i
-                x = random.uniform(*x_range)
-                y = random.uniform(*y_range)
-                vx = random.uniform(*vx_range)
-                vy = random.uniform(*vy_range)
-                ax = random.uniform(*ax_range)
-                ay = random.uniform(*ay_range)
+                x = self.rng.uniform(*x_range)
+                y = self.rng.uniform(*y_range)
+                vx = self.rng.uniform(*vx_range)
+                vy = self.rng.uniform(*vy_range)
+                ax = self.rng.uniform(*ax_range)
+                ay = self.rng.uniform(*ay_range)
 
                 node = Node(self, camp)
                 node.init_state(node_id, [x, y], [vx, vy], [ax, ay])
                 nodes.append(node)
+        elif method == "bulk":
+            # 与 "random" 相同的均匀分布，但一次生成全部数组，适合大规模节点
+            if camp is None:
+                raise ValueError("随机创建节点时，需要指定阵营！")
+            generator = np.random.default_rng(self.rng.getrandbits(64))
+            self.init_scenario(random_scenario(generator, camp, n, x_range, y_range,
+                                               vx_range, vy_range, ax_range, ay_range))
+            return
         elif method == "file":
             """
             文件名命名为：nodes.txt, 放在config文件夹下 
@@ -75,52 +203,399 @@ class God:
             node_id color x y vx vy ax ay
             实例： 1 blue 1.0 1.0 1.0 1.0 0.1 0.1
             表示为节点1，阵营为蓝色，位置为(1.0, 1.0)，速度为(1.0, 1.0)，加速度为(0.1, 0.1)
+            节点按 color 列分配到各自的阵营；指定 camp 时只读取该阵营的节点
             """
             try:
-                with open(os.path.join(current_directory, 'config', 'nodes.txt'), 'r', encoding='utf-8') as f:
-                    for line in f:
-                        parts = line.strip().split()
-                        if not parts:
-                            continue
-                        node_id = int(parts[0])
-                        color_from_file = parts[1]
-                        x = float(parts[2])
-                        y = float(parts[3])
-                        vx = float(parts[4])
-                        vy = float(parts[5])
-                        ax = float(parts[6])
-                        ay = float(parts[7])
-
-                        node = Node(self, color_from_file)
-                        node.init_state(node_id, [x, y], [vx, vy], [ax, ay])
-                        nodes.append(node)
+                scenario = load_text(os.path.join(current_directory, 'config', 'nodes.txt'))
             except FileNotFoundError:
                 print("读取文件不存在！")
+                return
+            self.init_scenario(scenario, camp)
+            return
 
-        if camp == "blue":
-            self.blue_nodes = nodes
-        elif camp == "red":
-            self.red_nodes = nodes
-        else:
+        self._assign_nodes(camp, nodes)
+
+    def init_scenario(self, scenario, camp=None):
+        """
+        批量初始化节点：场景数组按阵营拆分后一次写入状态存储，不逐行解析、也不逐个写入状态。
+        节点对象延迟到首次访问该阵营的节点列表时才创建。场景中出现的阵营会替换该阵营原有的全部节点
+        :param scenario: scenario.Scenario，或场景文件路径（.csv/.txt/.npy/.npz）
+        :param camp: 只加载指定阵营的节点，None 表示加载全部阵营
+        """
+        if isinstance(scenario, str):
+            scenario = load_scenario(scenario)
+        for part_camp, (node_ids, pos, vel, acc) in scenario.split().items():
+            if camp is not None and part_camp != camp:
+                continue
+            rows = self.state.add_many(node_ids, part_camp, pos, vel, acc)
+            self._assign_nodes(part_camp, [], deferred=(node_ids.tolist(), rows.tolist()))
+
+    def add_nodes(self, scenario):
+        """
+        运行中向各阵营追加节点，不替换已有节点，用于外部节点（如遥测接入的实体无人机）加入仿真
+        :param scenario: scenario.Scenario
+        :return: 新节点的行号数组，顺序与 scenario 一致
+        """
+        rows = np.empty(len(scenario), dtype=np.intp)
+        for camp, code in CAMP_CODES.items():
+            picked = np.flatnonzero(scenario.camps == code)
+            if not len(picked):
+                continue
+            rows[picked] = self.state.add_many(scenario.node_ids[picked], camp, scenario.pos[picked],
+                                               scenario.vel[picked], scenario.acc[picked])
+            nodes = [Node(self, camp).attach(node_id, row)
+                     for node_id, row in zip(scenario.node_ids[picked].tolist(), rows[picked].tolist())]
+            existing = self._camp_nodes(camp)
+            with self._deferred_lock:
+                for node in nodes:
+                    self.nodes_by_row[node.row] = node
+                # 整体替换节点列表，其他线程正在遍历的旧列表不受影响
+                self._nodes[camp] = existing + nodes
+        return rows
+
+    def _assign_nodes(self, camp, nodes, deferred=None):
+        """
+        用新创建的节点替换某个阵营原有的全部节点
+        :param camp: 阵营
+        :param nodes: 新节点列表
+        :param deferred: 延迟创建的节点 (节点ID列表, 行号列表)，状态已写入状态存储
+        """
+        if camp not in self._nodes:
             raise ValueError("阵营错误！")
+        with self._deferred_lock:
+            pending = self._deferred.pop(camp, None)
+            if pending is not None:
+                self.state.release(pending[1])
+                self.bus.release(pending[1])
+                self.links.pop(camp, None)
+            self._release_nodes(self._nodes[camp])
+            self._nodes[camp] = nodes
+            for node in nodes:
+                self.nodes_by_row[node.row] = node
+            if deferred is not None:
+                self._deferred[camp] = deferred
+
+    def _camp_nodes(self, camp):
+        """返回某个阵营的节点列表，有延迟创建的节点时先创建节点对象"""
+        if camp in self._deferred:
+            with self._deferred_lock:
+                pending = self._deferred.pop(camp, None)
+                if pending is not None:
+                    nodes = [Node(self, camp).attach(node_id, row) for node_id, row in zip(*pending)]
+                    for node in nodes:
+                        self.nodes_by_row[node.row] = node
+                    self._nodes[camp] = nodes
+        return self._nodes[camp]
+
+    @property
+    def blue_nodes(self):
+        return self._camp_nodes("blue")
+
+    @blue_nodes.setter
+    def blue_nodes(self, nodes):
+        self._assign_nodes("blue", nodes)
+
+    @property
+    def red_nodes(self):
+        return self._camp_nodes("red")
+
+    @red_nodes.setter
+    def red_nodes(self, nodes):
+        self._assign_nodes("red", nodes)
+
+    def _release_nodes(self, nodes):
+        """释放被替换的节点：清除其状态行和邻居关系"""
+        rows = [node.row for node in nodes]
+        self.state.release(rows)
+        self.bus.release(rows)
+        for row in rows:
+            self.nodes_by_row.pop(row, None)
+        for camp in {node.camp for node in nodes}:
+            self.links.pop(camp, None)
+
+    def refresh_neighbors(self, nodes):
+        """
+        对一组同阵营节点做一次邻居判定，只把新增和断开的邻居关系下发给各节点
+        :param nodes: 同阵营节点列表
+        """
+        if not nodes:
+            return
+        nodes = list(nodes)
+        rows = np.array([node.row for node in nodes], dtype=np.int64)
+        index = make_index(self.neighbor_engine, self.neighbor_distance)
+        index.build(self.state.pos[rows])
+        first, second = index.query_pairs(self.link_distance)
+        self.update_links(nodes[0].camp, rows[first], rows[second])
+
+    def update_links(self, camp, first_rows, second_rows):
+        """
+        根据本时刻 link_distance 以内的同阵营节点对更新邻居关系（带滞回）：
+        距离小于 neighbor_distance 的节点对建立邻居关系，已有的邻居关系在 link_distance 以内保持，
+        然后只把新增和断开的边下发给相关节点，开销与拓扑变化量成正比
+        :param camp: 阵营
+        :param first_rows: 节点对的第一个行号数组
+        :param second_rows: 节点对的第二个行号数组
+        :return: (新增的边, 断开的边)，编码同 self.links
+        """
+        first_rows = np.asarray(first_rows, dtype=np.int64)
+        second_rows = np.asarray(second_rows, dtype=np.int64)
+        delta = self.state.pos[second_rows] - self.state.pos[first_rows]
+        distance = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        keys = (np.minimum(first_rows, second_rows) << 32) | np.maximum(first_rows, second_rows)
+        old = self.links.get(camp, np.empty(0, dtype=np.int64))
+        links = np.unique(keys[(distance < self.neighbor_distance) | np.isin(keys, old)])
+        added = np.setdiff1d(links, old, assume_unique=True)
+        removed = np.setdiff1d(old, links, assume_unique=True)
+        self.links[camp] = links
+        self._dispatch_links(added, removed)
+        return added, removed
+
+    def _dispatch_links(self, added, removed):
+        """
+        把新增和断开的边分发给两端节点，并记录拓扑变化日志
+        每条边拆成两个方向后按起点行号排序分段，每个受影响的节点只调用一次 update_neighbor_delta
+        """
+        if not len(added) and not len(removed):
+            return
+        keys = np.concatenate((added, removed))
+        kinds = np.repeat(np.array([0, 1], dtype=np.int8), (len(added), len(removed)))  # 0 新增，1 断开
+        sources = np.concatenate((keys >> 32, keys & 0xFFFFFFFF))
+        targets = np.concatenate((keys & 0xFFFFFFFF, keys >> 32))
+        kinds = np.concatenate((kinds, kinds))
+        order = np.lexsort((targets, kinds, sources))
+        sources, targets, kinds = sources[order], targets[order], kinds[order]
+        starts = np.flatnonzero(np.concatenate(([True], sources[1:] != sources[:-1])))
+        # 每段内新增的边排在前面，分界处为该段第一条断开的边
+        splits = starts + np.add.reduceat(kinds == 0, starts)
+        by_row = self.nodes_by_row
+        others = [by_row[row] for row in targets.tolist()]
+        logged = self.log_sink.enabled_for(logging.DEBUG)
+        now = self.now()
+        bounds = starts.tolist()[1:] + [len(sources)]
+        for row, lo, split, hi in zip(sources[starts].tolist(), starts.tolist(), splits.tolist(), bounds):
+            node = by_row[row]
+            linked, unlinked = others[lo:split], others[split:hi]
+            node.update_neighbor_delta(linked, unlinked)
+            if logged:
+                for other in linked:
+                    self.log_sink.log(logging.DEBUG, node.camp, node.node_id, "link", now, other.node_id)
+                for other in unlinked:
+                    self.log_sink.log(logging.DEBUG, node.camp, node.node_id, "unlink", now, other.node_id)
+
+    def find_enemies(self, nodes_a, nodes_b):
+        """
+        一次计算两个阵营互相探测到的敌方节点
+        :param nodes_a: a 阵营节点列表
+        :param nodes_b: b 阵营节点列表
+        :return: (探测方行号数组, 目标行号数组)，包含两个方向的探测结果
+        """
+        if self.neighbor_engine == "brute":
+            # 参考模式：逐对调用 Node.detect_enemy
+            pairs = [(node.row, enemy.row) for nodes, enemies in ((nodes_a, nodes_b), (nodes_b, nodes_a))
+                     for node in nodes for enemy in enemies if node.detect_enemy(enemy)]
+            return (np.array([pair[0] for pair in pairs], dtype=np.int64),
+                    np.array([pair[1] for pair in pairs], dtype=np.int64))
+        rows_a = np.array([node.row for node in nodes_a], dtype=np.int64)
+        rows_b = np.array([node.row for node in nodes_b], dtype=np.int64)
+        (a_obs, a_tgt), (b_obs, b_tgt) = detect_pairs(self.state.pos[rows_a], self.state.vel[rows_a],
+                                                      self.state.pos[rows_b], self.state.vel[rows_b],
+                                                      self.detect_radius)
+        return np.concatenate((rows_a[a_obs], rows_b[b_obs])), np.concatenate((rows_b[a_tgt], rows_a[b_tgt]))
+
+    def refresh_enemies(self):
+        """
+        对红蓝双方做一次敌方探测，并把结果下发给各节点
+        """
+        self.dispatch_detections(*self.find_enemies(list(self.blue_nodes), list(self.red_nodes)))
+
+    def dispatch_detections(self, observers, targets):
+        """
+        把本时刻的探测结果一次分发给各探测方节点
+        节点对按探测方行号排序后分段，每个被探测到的节点只生成一条 TargetRecord，所有探测到它的节点共用；
+        只有本时刻或上一时刻有探测结果的节点需要更新，其余节点保持共用的空表
+        :param observers: 探测方行号数组
+        :param targets: 目标行号数组，与 observers 一一对应
+        """
+        observers = np.asarray(observers, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.lexsort((targets, observers))
+        observers, targets = observers[order], targets[order]
+        unique, inverse = np.unique(targets, return_inverse=True)
+        state = self.state
+        records = list(map(TargetRecord._make, zip(state.node_id[unique].tolist(), *state.pos[unique].T.tolist(),
+                                                   *state.vel[unique].T.tolist(), *state.acc[unique].T.tolist())))
+        records = [records[k] for k in inverse.tolist()]
+        ids = state.node_id[targets].tolist()
+        starts = np.flatnonzero(np.concatenate(([True], observers[1:] != observers[:-1])))[:len(observers)]
+        rows, starts = observers[starts].tolist(), starts.tolist()
+        by_row = self.nodes_by_row
+        for row, lo, hi in zip(rows, starts, starts[1:] + [len(observers)]):
+            by_row[row].set_detected_targets(dict(zip(ids[lo:hi], records[lo:hi])))
+        # 上一时刻有探测结果、本时刻没有的节点清空探测结果
+        for row in self._detecting.difference(rows):
+            node = by_row.get(row)
+            if node is not None:
+                node.set_detected_targets(NO_TARGETS)
+        self._detecting = set(rows)
+
+    def check_collisions(self):
+        """
+        对全部节点做一次连续碰撞检测，新产生和解除的告警写入日志
+        :return: 本次产生的告警事件列表
+        """
+        events = self.collisions.check(self.state, self.now())
+        if events:
+            self.metrics.inc("collision_alerts", sum(event["event"] == "alert" for event in events),
+                             "碰撞与接近告警次数")
+            for event in events:
+                (camp, node_id), (peer_camp, peer_id) = event["nodes"]
+                self.log_sink.log(logging.WARNING if event["event"] == "alert" else logging.INFO,
+                                  camp, node_id, "collision" if event["event"] == "alert" else "clear",
+                                  event["time"], peer_id,
+                                  {"peer_camp": peer_camp, "distance": event["distance"],
+                                   "fraction": event["fraction"]})
+        return events
+
+    def decide(self):
+        """
+        把全体节点的观测交给决策模块，取回的加速度指令一次写入状态存储
+        决策超时或未配置决策算法时不改变加速度，节点继续执行上一次的指令
+        """
+        if self.decision is not None:
+            self.apply_decision(self.decision.step(observe(self)))
+
+    def apply_decision(self, result):
+        """
+        把决策模块取回的加速度指令一次写入状态存储
+        :param result: DecisionEngine.step() 的返回值，None 表示本时刻没有新指令
+        """
+        if result is None:
+            return
+        rows, commands = result
+        # 计算期间被释放的节点不再下发指令
+        live = self.state.camp[rows] != FREE
+        self.state.acc[rows[live]] = commands[live]
+
+    def apply_telemetry(self):
+        """
+        把遥测网关积压的外部节点状态写入状态存储，未接入遥测时不做任何事
+        """
+        if self.telemetry is not None:
+            self.telemetry.apply()
+
+    def advance(self, time_step):
+        """
+        批量推进全部节点的运动状态
+        :param time_step: 计算时间步长
+        """
+        if self.shards is not None:
+            self.shards.integrate(time_step)
+        else:
+            self.model.advance(self.state, time_step)
+
+    def sense(self):
+        """
+        对全部节点做一次邻居判定和敌方探测，分区模式下由各工作进程并行完成，God 只负责汇总下发
+        """
+        if self.shards is None:
+            self.refresh_neighbors(self.blue_nodes)
+            self.refresh_neighbors(self.red_nodes)
+            self.refresh_enemies()
+            return
+        # 邻居关系按行号下发，需要先创建延迟的节点对象
+        for camp in CAMP_CODES:
+            self._camp_nodes(camp)
+        nb_src, nb_dst, det_obs, det_tgt = self.shards.sense()
+        # 每条无向边会被两端所在区域各报告一次，只保留一个方向
+        keep = nb_src < nb_dst
+        nb_src, nb_dst = nb_src[keep], nb_dst[keep]
+        for camp, code in CAMP_CODES.items():
+            same = self.state.camp[nb_src] == code
+            self.update_links(camp, nb_src[same], nb_dst[same])
+        self.dispatch_detections(det_obs, det_tgt)
+
+    def send_message(self, sender, receiver, message):
+        """
+        把节点消息交给消息总线，由总线按投递时刻批量放入接收方收件箱
+        """
+        self.bus.send(sender, receiver, message, self.now())
+
+    def send_messages(self):
+        """
+        锁步调度下一次为全部节点发送本时刻消息：每个有邻居的节点按状态存储创建一条消息，
+        再沿邻居关系的两个方向批量交给消息总线。设置了链路时延函数或需要记录 DEBUG 日志时仍逐个节点发送；
+        两种方式都按 (发送方行号, 接收方行号) 的顺序发送，消息总线的随机扰动和丢包按相同顺序抽取，结果相同
+        """
+        if self.bus.link_latency is not None or self.log_sink.enabled_for(logging.DEBUG):
+            for node in sorted(self.blue_nodes + self.red_nodes, key=lambda node: node.row):
+                node._msg_send_to_neighbors()
+            return
+        links = [keys for keys in self.links.values() if len(keys)]
+        if not links:
+            return
+        keys = np.concatenate(links)
+        senders = np.concatenate((keys >> 32, keys & 0xFFFFFFFF))
+        receivers = np.concatenate((keys & 0xFFFFFFFF, keys >> 32))
+        order = np.lexsort((receivers, senders))
+        senders, receivers = senders[order], receivers[order]
+        rows, inverse = np.unique(senders, return_inverse=True)
+        state = self.state
+        by_row = self.nodes_by_row
+        now = self.now()
+        ids = state.node_id[rows].tolist()
+        messages = list(map(Message._make, zip(ids, *state.pos[rows].T.tolist(), *state.vel[rows].T.tolist(),
+                                               *state.acc[rows].T.tolist(),
+                                               [by_row[row].group_id for row in rows.tolist()],
+                                               itertools.repeat(now))))
+        inverse = inverse.tolist()
+        self.bus.send_many([ids[k] for k in inverse], receivers.tolist(), [messages[k] for k in inverse], now)
+
+    def deliver_messages(self):
+        """
+        持续把消息总线中到期的消息投递到各节点收件箱
+        """
+        while True:
+            start = self.metrics.begin()
+            self.bus.deliver(self.now())
+            self.metrics.end("deliver", start)
+            time.sleep(0.1)
+
+    def publish_snapshot(self):
+        """
+        生成本时刻全部节点的只读快照并原子发布，再由快照编码推送帧
+        邻居表和探测结果只做一次整体复制，不获取节点锁
+        :return: 新发布的快照
+        """
+        nodes = self.blue_nodes + self.red_nodes
+        rows = [node.row for node in nodes]
+        snapshot = self.snapshots.publish(self.now(), rows, self.state.node_id[rows], self.state.camp[rows],
+                                          self.state.pos[rows], self.state.vel[rows], self.state.acc[rows],
+                                          [tuple(node.neighbor_table) for node in nodes],
+                                          [tuple(node.detected_targets) for node in nodes])
+        if self.recorder is not None:
+            self.recorder.record(snapshot)
+        self.stream.publish(snapshot.time, snapshot.rows, snapshot.node_ids, snapshot.camps,
+                            snapshot.pos, snapshot.vel, snapshot.acc, snapshot.neighbor_ids)
+        return snapshot
+
+    def publish_snapshots(self):
+        """
+        持续发布全局快照
+        """
+        while True:
+            start = self.metrics.begin()
+            self.publish_snapshot()
+            self.metrics.end("publish", start)
+            time.sleep(0.1)
 
     def update_blue_neighbors(self):
         """
         持续更新当前蓝色节点的邻居节点
         """
         while True:
-            if len(self.blue_nodes) <= 1:
-                time.sleep(0.1)
-                continue
-            for node in self.blue_nodes:
-                neighbors = []
-                for other in self.blue_nodes:
-                    if node.node_id == other.node_id:
-                        continue
-                    distance = self.calculate_distance(node.position, other.position)
-                    if distance < self.neighbor_distance:
-                        neighbors.append(other)
-                node.update_neighbors_by_god(neighbors)
+            start = self.metrics.begin()
+            self.refresh_neighbors(self.blue_nodes)
+            self.metrics.end("neighbors_blue", start)
             time.sleep(0.1)
 
     def update_red_neighbors(self):
@@ -128,38 +603,39 @@ class God:
         持续更新当前红色节点的邻居节点
         """
         while True:
-            if len(self.red_nodes) <= 1:
-                time.sleep(0.1)
-                continue
-            for node in self.red_nodes:
-                neighbors = []
-                for other in self.red_nodes:
-                    if node.node_id == other.node_id:
-                        continue
-                    distance = self.calculate_distance(node.position, other.position)
-                    if distance < self.neighbor_distance:
-                        neighbors.append(other)
-                node.update_neighbors_by_god(neighbors)
+            start = self.metrics.begin()
+            self.refresh_neighbors(self.red_nodes)
+            self.metrics.end("neighbors_red", start)
             time.sleep(0.1)
 
-    def update_blue_enemies(self):
+    def update_enemies(self):
+        """
+        持续更新红蓝双方探测到的敌方节点
+        """
         while True:
-            for blue_node in self.blue_nodes:
-                enemies = []
-                for red_node in self.red_nodes:
-                    if blue_node.detect_enemy(red_node):
-                        enemies.append(red_node)
-                blue_node.update_enemies_by_god(enemies)
+            start = self.metrics.begin()
+            self.refresh_enemies()
+            self.metrics.end("enemies", start)
             time.sleep(0.1)
 
-    def update_red_enemies(self):
+    def update_decisions(self):
+        """
+        持续调用决策模块
+        """
         while True:
-            for red_node in self.red_nodes:
-                enemies = []
-                for blue_node in self.blue_nodes:
-                    if red_node.detect_enemy(blue_node):
-                        enemies.append(blue_node)
-                red_node.update_enemies_by_god(enemies)
+            start = self.metrics.begin()
+            self.decide()
+            self.metrics.end("decide", start)
+            time.sleep(0.1)
+
+    def update_collisions(self):
+        """
+        持续进行碰撞检测
+        """
+        while True:
+            start = self.metrics.begin()
+            self.check_collisions()
+            self.metrics.end("collision", start)
             time.sleep(0.1)
 
     def run_node_in_thread(self):
@@ -173,18 +649,35 @@ class God:
             thread = threading.Thread(target=node.run, daemon=True)
             thread.start()
 
+    def start_shards(self):
+        """按 [sharding] WORKERS 启动分区进程，只用于锁步调度，WORKERS 为 0 时不启用"""
+        if self.shard_workers > 0 and self.shards is None:
+            self.shards = ShardedEngine(self.state, self.shard_workers, self.link_distance,
+                                        self.detect_radius, self.neighbor_engine, self.model)
+
     def run(self):
+        """
+        启动仿真。"lockstep" 模式下由单线程调度器按时刻推进，
+        否则沿用每个节点一个线程、God 多个更新线程的方式。分区仿真只在锁步模式下启用
+        """
+        if self.scheduler_mode == "lockstep":
+            self.start_shards()
+            self.scheduler = Scheduler(self, period=self.delay, realtime=self.realtime)
+            self.scheduler.start()
+            return
         thread = threading.Thread(target=self.update_blue_neighbors, daemon=True)
         thread.start()
         thread = threading.Thread(target=self.update_red_neighbors, daemon=True)
         thread.start()
-        thread = threading.Thread(target=self.update_blue_enemies, daemon=True)
+        thread = threading.Thread(target=self.update_enemies, daemon=True)
+        thread.start()
+        if self.decision is not None:
+            thread = threading.Thread(target=self.update_decisions, daemon=True)
+            thread.start()
+        thread = threading.Thread(target=self.update_collisions, daemon=True)
+        thread.start()
+        thread = threading.Thread(target=self.deliver_messages, daemon=True)
         thread.start()
-        thread = threading.Thread(target=self.update_red_enemies, daemon=True)
+        thread = threading.Thread(target=self.publish_snapshots, daemon=True)
         thread.start()
         self.run_node_in_thread()
-
-
-
-
-
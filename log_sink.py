@@ -0,0 +1,210 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+
+# 各类事件在按节点拆分后的文本日志中的格式
+EVENT_TEXT = {
+    "send": "发送消息至 {peer}: {payload}",
+    "recv": "接收到节点{peer}数据: {payload}",
+    "detect": "探测到敌方节点: {payload}",
+    "collision": "与节点{peer}的距离小于安全距离: {payload}",
+    "clear": "与节点{peer}的接近告警解除: {payload}",
+    "link": "与节点{peer}建立邻居关系",
+    "unlink": "与节点{peer}的邻居关系断开",
+}
+# 关闭日志时使用的级别
+OFF = logging.CRITICAL + 10
+
+
+def parse_level(name):
+    """
+    把配置文件中的日志级别名称转换为数值，"OFF" 表示关闭
+    """
+    name = name.strip().upper()
+    if name == "OFF":
+        return OFF
+    level = logging.getLevelName(name)
+    if not isinstance(level, int):
+        raise ValueError(f"未知的日志级别: {name}")
+    return level
+
+
+class LogSink:
+    """
+    队列式日志汇，代替每个节点一个 FileHandler
+    仿真线程只把原始记录放入队列，JSON 格式化和写文件都由后台线程批量完成；
+    所有节点写同一个 JSON Lines 文件，每行带 node_id、camp 字段，
+    需要按节点查看时再用 split_log 拆分。级别不够的记录在入队前就被丢弃，不产生格式化开销。
+    队列有长度上限，后台线程跟不上时丢弃新记录并计数，不让内存无限增长；进程退出时自动写完队列并关闭文件
+    """
+
+    def __init__(self, path, level=logging.DEBUG, batch_size=1000, flush_interval=0.5, max_pending=100000):
+        """
+        :param path: 日志文件路径
+        :param level: 日志级别，低于该级别的记录直接丢弃
+        :param batch_size: 每批最多写入的记录数
+        :param flush_interval: 队列空闲时最长多久刷新一次文件（秒）
+        :param max_pending: 队列中尚未写入的记录数上限，超出时丢弃新记录
+        """
+        self.path = path
+        self.level = level
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(max_pending)
+        self._file = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        # 队列已满而丢弃的记录数
+        self.dropped = 0
+
+    def enabled_for(self, level):
+        """判断某个级别的日志是否需要记录，调用方可据此跳过准备日志内容的开销"""
+        return level >= self.level
+
+    def log(self, level, camp, node_id, event, sim_time, peer=None, payload=None):
+        """
+        记录一条节点日志
+        :param level: 日志级别
+        :param camp: 节点阵营
+        :param node_id: 节点ID
+        :param event: 事件类型，如 "send"、"recv"、"detect"
+        :param sim_time: 仿真时间
+        :param peer: 对端节点ID
+        :param payload: 事件内容，需可被 JSON 序列化，入队后不应再修改
+        """
+        if level < self.level or self._closed:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((sim_time, level, camp, node_id, event, peer, payload))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # 每次运行覆盖上一次的日志
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._thread = threading.Thread(target=self._write_loop, daemon=True)
+            self._thread.start()
+            # 后台线程是守护线程，退出前写完队列中的日志
+            atexit.register(self.close)
+
+    def _write_loop(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            waiters = []
+            closing = False
+            for item in batch:
+                if item is None:
+                    closing = True
+                    continue
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    continue
+                sim_time, level, camp, node_id, event, peer, payload = item
+                lines.append(json.dumps({
+                    "time": sim_time,
+                    "level": logging.getLevelName(level),
+                    "camp": camp,
+                    "node_id": node_id,
+                    "event": event,
+                    "peer": peer,
+                    "payload": payload,
+                }, ensure_ascii=False))
+            if lines:
+                self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            for waiter in waiters:
+                waiter.set()
+            if closing:
+                self._file.close()
+                return
+
+    def pending(self):
+        """返回队列中尚未写入文件的记录数（近似值）"""
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        """
+        等待此前放入队列的日志全部写入文件
+        :param timeout: 最长等待时间（秒）
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """
+        写完队列中的日志并关闭文件，之后的日志被忽略
+        :param timeout: 最长等待时间（秒）
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+def split_log(path, out_directory):
+    """
+    把共享日志按节点拆分为文本日志，每个节点一个文件，文件名与原来的逐节点日志相同
+    :param path: JSON Lines 日志文件路径
+    :param out_directory: 输出目录
+    :return: 生成的文件数
+    """
+    os.makedirs(out_directory, exist_ok=True)
+    files = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = (record["camp"], record["node_id"])
+                if key not in files:
+                    files[key] = open(os.path.join(out_directory, f"{key[0]}_node_{key[1]}.log"), "w",
+                                      encoding="utf-8")
+                template = EVENT_TEXT.get(record["event"], record["event"] + " {peer}: {payload}")
+                text = template.format(peer=record["peer"], payload=record["payload"])
+                files[key].write(f"{record['time']:.3f} - Node-{record['camp']}-{record['node_id']} - "
+                                 f"{record['level']} - {text}\n")
+    finally:
+        for f in files.values():
+            f.close()
+    return len(files)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把共享的 JSON Lines 日志按节点拆分")
+    parser.add_argument("path", help="JSON Lines 日志文件")
+    parser.add_argument("out_directory", help="输出目录")
+    args = parser.parse_args()
+    print(f"已生成 {split_log(args.path, args.out_directory)} 个节点日志")
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import random
+import threading
+from collections import namedtuple
+
+
+class Delivery(namedtuple("Delivery", ["sender_id", "message", "recv_time"])):
+    """
+    收件箱中的一条消息：发送方ID、消息内容（所有接收方共用）和接收时间
+    消息内容的字段可以直接按属性读取，如 delivery.position
+    """
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        return getattr(self.message, name)
+
+
+class MessageBus:
+    """
+    集中式消息总线，代替“每条消息一个线程”的 delayed_send
+    发送时按链路时延计算投递时刻，放入按投递时刻排序的堆中；
+    deliver() 每个时刻调用一次，把到期消息批量放入接收方收件箱，
+    节点通过 drain() 一次取走自己收件箱里的全部消息
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, bandwidth=0, rng=None, link_latency=None):
+        """
+        :param latency: 基础传输时延（秒）
+        :param jitter: 时延随机扰动幅度，实际时延在 latency ± jitter 之间均匀分布
+        :param loss: 丢包概率，0 表示无损通讯
+        :param bandwidth: 每个接收方每批最多投递的消息数，0 表示不限制，超出的消息顺延到下一批
+        :param rng: 随机数发生器，用于扰动和丢包，传入带种子的发生器可保证结果可复现
+        :param link_latency: 可选的链路时延函数 f(sender, receiver)，设置后代替 latency
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.bandwidth = bandwidth
+        self.rng = rng if rng is not None else random.Random()
+        self.link_latency = link_latency
+        self._queue = []  # (投递时刻, 序号, 接收方行号, 发送方ID, 消息, 是否因带宽限制顺延过)
+        self._seq = itertools.count()  # 投递时刻相同时按发送顺序投递
+        self._inboxes = {}  # 接收方行号 -> [Delivery]
+        self._lock = threading.Lock()
+        # 统计信息
+        self.sent = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def send(self, sender, receiver, message, now):
+        """
+        发送一条消息
+        :param sender: 发送方节点
+        :param receiver: 接收方节点
+        :param message: 消息内容
+        :param now: 当前仿真时间
+        """
+        with self._lock:
+            self.sent += 1
+            if self.loss and self.rng.random() < self.loss:
+                self.dropped += 1
+                return
+            if self.link_latency is not None:
+                latency = self.link_latency(sender, receiver)
+            else:
+                latency = self.latency
+            if self.jitter:
+                latency += self.rng.uniform(-self.jitter, self.jitter)
+            # 没有时延时直接使用 now，同一时刻的全部消息共用同一个时间对象
+            deliver_time = now + latency if latency > 0 else now
+            heapq.heappush(self._queue, (deliver_time, next(self._seq), receiver.row, sender.node_id, message, False))
+
+    def send_many(self, sender_ids, receiver_rows, messages, now):
+        """
+        批量发送消息，与按相同顺序逐条调用 send() 等价，不支持 link_latency
+        :param sender_ids: 发送方ID列表
+        :param receiver_rows: 接收方行号列表
+        :param messages: 消息列表，三者一一对应
+        :param now: 当前仿真时间
+        """
+        if self.link_latency is not None:
+            raise ValueError("设置了链路时延函数时只能逐条发送！")
+        with self._lock:
+            count = len(messages)
+            self.sent += count
+            first = next(self._seq)
+            self._seq = itertools.count(first + count)
+            if not self.loss and not self.jitter:
+                # 全部消息的投递时刻相同，按序号排列的列表本身就是合法的堆
+                deliver_time = now + self.latency if self.latency > 0 else now
+                items = list(zip(itertools.repeat(deliver_time), range(first, first + count), receiver_rows,
+                                 sender_ids, messages, itertools.repeat(False)))
+            else:
+                items = []
+                for seq, row, sender_id, message in zip(range(first, first + count), receiver_rows,
+                                                        sender_ids, messages):
+                    if self.loss and self.rng.random() < self.loss:
+                        self.dropped += 1
+                        continue
+                    latency = self.latency
+                    if self.jitter:
+                        latency += self.rng.uniform(-self.jitter, self.jitter)
+                    items.append((now + latency if latency > 0 else now, seq, row, sender_id, message, False))
+                items.sort()
+            if self._queue:
+                self._queue.extend(items)
+                heapq.heapify(self._queue)
+            else:
+                self._queue = items
+
+    def deliver(self, now):
+        """
+        把投递时刻不晚于 now 的消息批量放入接收方收件箱
+        :param now: 当前仿真时间
+        :return: 本批投递的消息数
+        """
+        with self._lock:
+            if not self.bandwidth:
+                return self._deliver_all(now)
+            counts = {}
+            deferred = []
+            delivered = 0
+            while self._queue and self._queue[0][0] <= now:
+                item = heapq.heappop(self._queue)
+                deliver_time, seq, row, sender_id, message, late = item
+                if self.bandwidth and counts.get(row, 0) >= self.bandwidth:
+                    # 超出带宽限制，顺延到下一批
+                    deferred.append((deliver_time, seq, row, sender_id, message, True))
+                    continue
+                counts[row] = counts.get(row, 0) + 1
+                # 顺延过的消息以实际投递的时刻作为接收时间
+                self._inboxes.setdefault(row, []).append(Delivery(sender_id, message, now if late else deliver_time))
+                delivered += 1
+            for item in deferred:
+                heapq.heappush(self._queue, item)
+            self.delivered += delivered
+            return delivered
+
+    def _deliver_all(self, now):
+        """没有带宽限制时一次取出全部到期消息，按 (投递时刻, 序号) 排序后放入收件箱"""
+        due = [item for item in self._queue if item[0] <= now]
+        if not due:
+            return 0
+        if len(due) == len(self._queue):
+            self._queue = []
+        else:
+            self._queue = [item for item in self._queue if item[0] > now]
+            heapq.heapify(self._queue)
+        due.sort()
+        inboxes = self._inboxes
+        for deliver_time, _, row, sender_id, message, late in due:
+            inbox = inboxes.get(row)
+            if inbox is None:
+                inbox = inboxes[row] = []
+            inbox.append(Delivery(sender_id, message, now if late else deliver_time))
+        self.delivered += len(due)
+        return len(due)
+
+    def drain(self, receiver):
+        """
+        取走接收方收件箱中的全部消息
+        :param receiver: 接收方节点
+        :return: [Delivery(发送方ID, 消息, 接收时间)]
+        """
+        with self._lock:
+            return self._inboxes.pop(receiver.row, [])
+
+    def release(self, rows):
+        """
+        丢弃发往已释放节点的消息：清空其收件箱，并从队列中删除尚未投递的消息
+        :param rows: 已释放的行号
+        """
+        rows = set(rows)
+        if not rows:
+            return
+        with self._lock:
+            for row in rows:
+                self._inboxes.pop(row, None)
+            kept = [item for item in self._queue if item[2] not in rows]
+            if len(kept) != len(self._queue):
+                heapq.heapify(kept)
+                self._queue = kept
+
+    def pending(self):
+        """返回尚未投递的消息数"""
+        return len(self._queue)
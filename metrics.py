@@ -0,0 +1,115 @@
+import threading
+import time
+
+# 指标名前缀
+PREFIX = "dgs"
+
+
+class Metrics:
+    """
+    轻量级运行指标：各阶段耗时、计数器，以及抓取时才计算的瞬时值
+    热路径上只做一次 perf_counter 和一次加法；关闭时 begin() 直接返回 None，
+    end() 和 inc() 立即返回，几乎没有开销。render() 输出 Prometheus 文本格式，供 /metrics 接口抓取
+    """
+
+    def __init__(self, enabled=True):
+        """
+        :param enabled: 是否记录耗时和计数，关闭时抓取结果只包含瞬时值
+        """
+        self.enabled = enabled
+        self._phases = {}  # 阶段名 -> [次数, 总耗时, 最大耗时]
+        self._counters = {}  # 计数器名 -> (说明, 数值)
+        self._gauges = []  # (指标名, 类型, 说明, 取值函数)
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """
+        开始计时
+        :return: 起始时刻，关闭时返回 None
+        """
+        if not self.enabled:
+            return None
+        return time.perf_counter()
+
+    def end(self, phase, start):
+        """
+        结束计时，把耗时计入对应阶段
+        :param phase: 阶段名
+        :param start: begin() 的返回值
+        :return: 本次耗时（秒），关闭时返回 None
+        """
+        if start is None:
+            return None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self._phases.get(phase)
+            if stats is None:
+                self._phases[phase] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+        return elapsed
+
+    def inc(self, name, value=1, help_text=""):
+        """
+        计数器加 value
+        :param name: 计数器名，输出时自动加 _total 后缀
+        :param value: 增量
+        :param help_text: 指标说明
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            _, total = self._counters.get(name, (help_text, 0))
+            self._counters[name] = (help_text, total + value)
+
+    def register(self, name, fn, help_text="", kind="gauge"):
+        """
+        注册一个抓取时才计算的指标，如队列长度、线程数，或其他模块自己维护的累计值
+        :param name: 指标名
+        :param fn: 无参取值函数
+        :param help_text: 指标说明
+        :param kind: 指标类型，"gauge" 或 "counter"
+        """
+        self._gauges.append((name, kind, help_text, fn))
+
+    def counter(self, name):
+        """返回计数器的当前值，未计数时为 0"""
+        with self._lock:
+            return self._counters.get(name, ("", 0))[1]
+
+    def phase_stats(self):
+        """返回各阶段耗时统计的副本 {阶段名: (次数, 总耗时, 最大耗时)}"""
+        with self._lock:
+            return {phase: tuple(stats) for phase, stats in self._phases.items()}
+
+    def render(self):
+        """
+        输出 Prometheus 文本格式的全部指标
+        """
+        lines = []
+        phases = self.phase_stats()
+        with self._lock:
+            counters = dict(self._counters)
+        if phases:
+            lines.append(f"# HELP {PREFIX}_phase_seconds 各仿真阶段的耗时")
+            lines.append(f"# TYPE {PREFIX}_phase_seconds summary")
+            for phase, (count, total, _) in sorted(phases.items()):
+                lines.append(f'{PREFIX}_phase_seconds_count{{phase="{phase}"}} {count}')
+                lines.append(f'{PREFIX}_phase_seconds_sum{{phase="{phase}"}} {total:.9f}')
+            lines.append(f"# HELP {PREFIX}_phase_seconds_max 各仿真阶段的最大耗时")
+            lines.append(f"# TYPE {PREFIX}_phase_seconds_max gauge")
+            for phase, (_, _, largest) in sorted(phases.items()):
+                lines.append(f'{PREFIX}_phase_seconds_max{{phase="{phase}"}} {largest:.9f}')
+        for name, (help_text, total) in sorted(counters.items()):
+            lines.append(f"# HELP {PREFIX}_{name}_total {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {total}")
+        for name, kind, help_text, fn in self._gauges:
+            metric = f"{PREFIX}_{name}_total" if kind == "counter" else f"{PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {fn()}")
+        return "\n".join(lines) + "\n"
@@ -1,9 +1,88 @@
+import numpy as np
 
 
+def _euler(pos, vel, accel, dt):
+    """显式欧拉：先用当前速度更新位置，再更新速度（与 calculate_movement 相同）"""
+    return pos + vel * dt, vel + accel(pos, vel) * dt
+
+
+def _semi_implicit_euler(pos, vel, accel, dt):
+    """半隐式欧拉：先更新速度，再用新速度更新位置"""
+    vel = vel + accel(pos, vel) * dt
+    return pos + vel * dt, vel
+
+
+def _velocity_verlet(pos, vel, accel, dt):
+    """速度 Verlet：位置按二阶泰勒展开更新，速度用前后两次加速度的平均值更新"""
+    a0 = accel(pos, vel)
+    new_pos = pos + vel * dt + 0.5 * a0 * dt * dt
+    a1 = accel(new_pos, vel + a0 * dt)
+    return new_pos, vel + 0.5 * (a0 + a1) * dt
+
+
+def _rk4(pos, vel, accel, dt):
+    """四阶龙格-库塔：对 (位置, 速度) 整体求四次导数后加权平均"""
+    k1p, k1v = vel, accel(pos, vel)
+    k2p = vel + 0.5 * dt * k1v
+    k2v = accel(pos + 0.5 * dt * k1p, k2p)
+    k3p = vel + 0.5 * dt * k2v
+    k3v = accel(pos + 0.5 * dt * k2p, k3p)
+    k4p = vel + dt * k3v
+    k4v = accel(pos + dt * k3p, k4p)
+    return (pos + dt / 6.0 * (k1p + 2 * k2p + 2 * k3p + k4p),
+            vel + dt / 6.0 * (k1v + 2 * k2v + 2 * k3v + k4v))
+
+
+# 积分器名称 -> 函数 f(位置, 速度, 加速度函数, 步长) -> (新位置, 新速度)
+INTEGRATORS = {
+    "euler": _euler,
+    "semi_implicit": _semi_implicit_euler,
+    "verlet": _velocity_verlet,
+    "rk4": _rk4,
+}
+
+
+def register_integrator(name, integrator):
+    """
+    注册自定义积分器
+    :param name: 积分器名称，可在 config.ini 的 INTEGRATOR 中使用
+    :param integrator: 函数 f(位置, 速度, 加速度函数, 步长) -> (新位置, 新速度)，数组形状均为 (N, 2)
+    """
+    INTEGRATORS[name] = integrator
+
+
+def _clamp_norm(vectors, limit):
+    """把每行向量的长度限制在 limit 以内，limit 为 0 表示不限制"""
+    if not limit:
+        return vectors
+    norm = np.sqrt(vectors[:, 0] ** 2 + vectors[:, 1] ** 2)
+    over = norm > limit
+    if over.any():
+        vectors = vectors.copy()
+        vectors[over] *= (limit / norm[over])[:, None]
+    return vectors
+
 
 class Model:
-    def __init__(self):
+    def __init__(self, integrator="euler", substeps=1, max_speed=0.0, max_accel=0.0, acceleration=None):
+        """
+        :param integrator: 积分器名称，"euler"、"semi_implicit"、"verlet"、"rk4" 或已注册的自定义积分器
+        :param substeps: 每个时间步长内的子步数，子步越多轨迹误差越小，与通讯、感知的频率无关
+        :param max_speed: 最大速度，0 表示不限制
+        :param max_accel: 最大加速度，0 表示不限制
+        :param acceleration: 可选的加速度函数 f(位置, 速度, 节点加速度) -> 加速度，
+                             默认加速度就是状态存储中的节点加速度（匀加速运动）
+        """
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"未知的积分器: {integrator}")
+        if substeps < 1:
+            raise ValueError("子步数必须大于0！")
         self.type = 0
+        self.integrator = integrator
+        self.substeps = int(substeps)
+        self.max_speed = max_speed
+        self.max_accel = max_accel
+        self.acceleration = acceleration
 
     @staticmethod
     def calculate_movement(node, time_step):
@@ -16,4 +95,39 @@ class Model:
         node.position[1] = node.position[1] + node.velocity[1] * time_step
 
         node.velocity[0] = node.velocity[0] + node.acceleration[0] * time_step
-        node.velocity[1] = node.velocity[1] + node.acceleration[1] * time_step
\ No newline at end of file
+        node.velocity[1] = node.velocity[1] + node.acceleration[1] * time_step
+
+    def step(self, pos, vel, acc, time_step):
+        """
+        用配置的积分器把一组节点推进 time_step，分为 substeps 个子步，每个子步后施加速度限制
+        :param pos: 节点位置，形状为 (N, 2)
+        :param vel: 节点速度，形状为 (N, 2)
+        :param acc: 节点加速度，形状为 (N, 2)
+        :param time_step: 计算时间步长
+        :return: (新位置, 新速度)
+        """
+        acc = _clamp_norm(acc, self.max_accel)
+        if self.acceleration is None:
+            def accel(p, v):
+                return acc
+        else:
+            def accel(p, v):
+                return _clamp_norm(self.acceleration(p, v, acc), self.max_accel)
+        integrator = INTEGRATORS[self.integrator]
+        dt = time_step / self.substeps
+        vel = _clamp_norm(vel, self.max_speed)
+        for _ in range(self.substeps):
+            pos, vel = integrator(pos, vel, accel, dt)
+            vel = _clamp_norm(vel, self.max_speed)
+        return pos, vel
+
+    def advance(self, state, time_step, rows=None):
+        """
+        批量推进状态存储中的节点
+        :param state: 集中式状态存储 FleetState
+        :param time_step: 计算时间步长
+        :param rows: 需要推进的行号，None 表示全部节点
+        """
+        if rows is None:
+            rows = slice(0, state.size)
+        state.pos[rows], state.vel[rows] = self.step(state.pos[rows], state.vel[rows], state.acc[rows], time_step)
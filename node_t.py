@@ -2,14 +2,13 @@ import configparser
 import logging
 import math
 import os
-import queue
 import random
-import shutil
 import threading
 import time
+from collections import namedtuple
 from datetime import datetime
+from types import MappingProxyType
 
-from model import Model
 
 # 获取当前脚本所在路径
 current_directory = os.path.dirname(os.path.abspath(__file__))
@@ -21,29 +20,37 @@ config.read(config_file_path)
 delay = float(config.get("send_delay", "DELAY"))
 detect_radius = float(config.get("detect_radius", "DETECT_RADIUS"))
 
-# 创建日志目录
+# 日志目录，由日志汇在首次写入时创建，每次运行覆盖上一次的日志文件
 log_directory = os.path.join(current_directory, "logs")
-# 如果日志文件夹存在，则删除
-if os.path.exists(log_directory):
-    shutil.rmtree(log_directory)
-os.makedirs(log_directory, exist_ok=True)  # 创建日志目录
 
-def delayed_send(sender, receiver, message, delay_t=1.0):
+class Message(namedtuple("Message", ["node_id", "x", "y", "vx", "vy", "ax", "ay", "group_id", "send_time"])):
     """
-    模拟延迟发送消息
-    1. 新开一个小线程
-    :param message: 发送信息，信息包含。。。
-    :param sender: 发送方
-    :param receiver: 接收方
-    # :param delay_t: 发送延迟
+    节点每个时刻发出的消息，所有接收方共用同一个只读对象，不逐个复制
+    位置、速度、加速度的分量直接保存为浮点数，不再各自嵌套一个元组；按 position 等属性读取时才组成元组
     """
+    __slots__ = ()
+
+    position = property(lambda self: (self.x, self.y))
+    velocity = property(lambda self: (self.vx, self.vy))
+    acceleration = property(lambda self: (self.ax, self.ay))
+
+    def _asdict(self):
+        return {"node_id": self.node_id, "position": self.position, "velocity": self.velocity,
+                "acceleration": self.acceleration, "group_id": self.group_id, "send_time": self.send_time}
+
+
+class TargetRecord(namedtuple("TargetRecord", ["node_id", "x", "y", "vx", "vy", "ax", "ay"])):
+    """探测结果中的一项：探测时刻敌方节点的状态，保存方式与 Message 相同"""
+    __slots__ = ()
+
+    position = property(lambda self: (self.x, self.y))
+    velocity = property(lambda self: (self.vx, self.vy))
+    acceleration = property(lambda self: (self.ax, self.ay))
+
+
+# 没有探测到敌方节点时所有节点共用的只读空表
+NO_TARGETS = MappingProxyType({})
 
-    def _task():
-        # jitter = random.uniform(-0.05, 0.05)  # 添加随机扰动（±0.05秒）
-        # time.sleep(delay_t + jitter)
-        # time.sleep(delay_t)
-        receiver.store_incoming(sender.node_id, message)
-    threading.Thread(target=_task, daemon=True).start()
 
 def timestamp_to_datetime(timestamp):
     """将时间戳转换为可读的时间字符串"""
@@ -51,27 +58,28 @@ def timestamp_to_datetime(timestamp):
     return dt_object.strftime("%Y-%m-%d %H:%M:%S")
 
 class Node:
+    # 固定属性布局，不为每个节点创建属性字典，大规模节点时显著减少内存
+    __slots__ = ("running", "god", "state", "row", "node_id", "group_id", "neighbors", "neighbor_table",
+                 "detected_targets", "buffered_neighbors", "camp", "_lock", "log")
+
     def __init__(self, god, camp):
         self.running = True
         self.god = god
+        self.state = god.state  # 集中式状态存储，位置、速度、加速度都保存在这里
+        self.row = None  # 本节点在状态存储中的行号
         self.node_id = None
-        self.position = None
-        self.velocity = None
-        self.direction = None
-        self.acceleration = None
         self.group_id = 0
-        self.neighbors = []
-        self.enemies = []
-        self.neighbor_table = {} # 邻居节点表
-        self.detected_targets = {} # 检测到的敌方节点
-        self.buffered_neighbors = {}  # 缓冲区，存储邻居节点信息
-        self.incoming_queue = queue.Queue()  # 消息队列
+        self.neighbors = {}  # 当前邻居节点，节点ID -> 节点，由 God 增量维护
+        self.neighbor_table = {} # 邻居节点表，节点ID -> 该邻居最近一次发来的 message_bus.Delivery
+        self.detected_targets = NO_TARGETS # 检测到的敌方节点，节点ID -> TargetRecord
+        # 缓冲区：直接保存从消息总线收件箱取走的 [message_bus.Delivery]，没有消息时为空元组
+        self.buffered_neighbors = ()
         self.camp = camp  # 阵营：蓝色（"blue"） or 红色（"red"）
 
         # 加一把锁，用于 neighbor_table 的并发读写
         self._lock = threading.Lock()
-        # 日志记录器
-        self.logger = None
+        # 日志汇，所有节点共用，由后台线程写入同一个日志文件
+        self.log = god.log_sink
 
 
     def init_state(self, node_id, pos, vel, acc):
@@ -83,33 +91,58 @@ class Node:
         :param acc: 节点加速度[ax, ay]
         """
         self.node_id = node_id
-        self.position = pos
-        self.velocity = vel
-        self.acceleration = acc
-        # 日志文件路径（每个节点一个日志文件）
-        log_file_path = os.path.join(log_directory, f"{self.camp}_node_{self.node_id}.log")
-        self.logger = logging.getLogger(f"NodeLogger-{self.node_id}-{self.camp}")
-        self.logger.setLevel(logging.DEBUG)
-        # 创建 FileHandler，并设置好输出格式
-        file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
-        formatter = logging.Formatter(
-            fmt="%(asctime)s - Node-%(name)s - %(levelname)s - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S"
-        )
-        file_handler.setFormatter(formatter)
-        # 为避免重复添加 Handler，先判断是否已有 Handler
-        if not self.logger.handlers:
-            self.logger.addHandler(file_handler)
-
-        # 不让日志传递到根 Logger，可设置
-        self.logger.propagate = False
+        self.row = self.state.add(node_id, self.camp, pos, vel, acc)
+
+    def attach(self, node_id, row):
+        """
+        绑定到状态存储中已写好的一行，用于批量初始化
+        :param node_id: 节点ID
+        :param row: 行号
+        :return: 节点本身
+        """
+        self.node_id = node_id
+        self.row = row
+        return self
+
+    @property
+    def position(self):
+        """节点位置，是状态存储中对应行的视图"""
+        if self.row is None:
+            return None
+        return self.state.pos[self.row]
+
+    @position.setter
+    def position(self, value):
+        self.state.pos[self.row] = value
+
+    @property
+    def velocity(self):
+        """节点速度，是状态存储中对应行的视图"""
+        if self.row is None:
+            return None
+        return self.state.vel[self.row]
+
+    @velocity.setter
+    def velocity(self, value):
+        self.state.vel[self.row] = value
+
+    @property
+    def acceleration(self):
+        """节点加速度，是状态存储中对应行的视图"""
+        if self.row is None:
+            return None
+        return self.state.acc[self.row]
+
+    @acceleration.setter
+    def acceleration(self, value):
+        self.state.acc[self.row] = value
 
     def detect_enemy(self, enemy):
         """
         在当前节点前进方向 ±30°，半径 50 范围内，检测敌方节点
         检测到返回True，否则返回False
         """
-        if not self.velocity or (self.velocity[0] == 0 and self.velocity[1] == 0):
+        if self.velocity is None or (self.velocity[0] == 0 and self.velocity[1] == 0):
             return False # 如果没有速度，不检测
 
         vx, vy = self.velocity
@@ -120,14 +153,14 @@ class Node:
         unit_vx = vx / speed
         unit_vy = vy / speed
         # 清空已检测列表
-        self.detected_targets = {}
+        self.detected_targets = NO_TARGETS
 
         ex, ey = enemy.position
         sx, sy = self.position
         dx, dy = ex - sx, ey - sy  # 目标相对本节点的向量
         distance = math.sqrt(dx ** 2 + dy ** 2)
         # 目标距离是否在设定的探查半径以内
-        if distance > detect_radius:
+        if distance > self.god.detect_radius:
             return False
         # 计算方向夹角 cos(θ) = (dx, dy) ⋅ (unit_vx, unit_vy) / |dx, dy|
         dot_product = dx * unit_vx + dy * unit_vy
@@ -140,73 +173,52 @@ class Node:
         """把上一轮缓冲的邻居数据应用到 neighbor_table"""
         with self._lock:
             if self.buffered_neighbors:
-                for sender_id, message in self.buffered_neighbors.items():
-                    # 记录日志
-                    self.logger.debug(f"接收到节点{sender_id}数据: {message}")
-                self.neighbor_table = self.buffered_neighbors.copy()  # 更新 neighbor_table
-                self.buffered_neighbors.clear()  # 清空缓冲区，为下一轮存储新的邻居信息
-
-    def _update_neighbor_table(self, sender_id, message):
-        """不立即更新邻居表，而是先存入缓冲区，下一轮再更新"""
-        with self._lock:
-            if sender_id not in self.buffered_neighbors:
-                self.buffered_neighbors[sender_id] = {}
-
-            self.buffered_neighbors[sender_id].update({
-                "node_id": message["id"],
-                "position": message["position"],
-                "velocity": message["velocity"],
-                "acceleration": message["acceleration"],
-                "group_id": message["group_id"],
-                # "neighbor_table": message["neighbor_table"],
-                # "send_time": timestamp_to_datetime(message["send_time"]),
-                # "recv_time": timestamp_to_datetime(time.time()+delay)
-                "send_time": message["send_time"],
-                "recv_time": time.time()+delay
-            })
+                # 取出并清空缓冲区，为下一轮存储新的邻居信息
+                buffered, self.buffered_neighbors = self.buffered_neighbors, ()
+                if self.log.enabled_for(logging.DEBUG):
+                    now = self.god.now()
+                    for entry in buffered:
+                        # 记录日志
+                        self.log.log(logging.DEBUG, self.camp, self.node_id, "recv", now, entry.sender_id,
+                                     dict(entry.message._asdict(), recv_time=entry.recv_time))
+                # 原地更新 neighbor_table，只更新仍是邻居的发送方，已断开的邻居由 God 下发的变化删除；
+                # 同一发送方的新消息覆盖旧消息。表中直接保存总线投递的记录，不复制消息内容
+                for entry in buffered:
+                    if entry.sender_id in self.neighbors:
+                        self.neighbor_table[entry.sender_id] = entry
 
     def _update_state(self):
-        model = Model()
-        model.calculate_movement(self, 1)
-
-    def store_incoming(self, sender_id, message):
-        """
-        这里设置信息队列，存储接收到的信息
-        """
-        self.incoming_queue.put((sender_id, message))
+        # 使用 God 统一配置的运动模型，只推进本节点所在的一行
+        self.god.model.advance(self.state, 1, rows=slice(self.row, self.row + 1))
 
     def _msg_send_to_neighbors(self):
         """
-        向所有邻居发送消息, 每条消息都有一个固定延迟.
-        也可以设计成对每个邻居不一样的延迟, 这里先简单处理.
+        向所有邻居发送消息, 由 God 的消息总线按链路时延投递.
+        按邻居的行号顺序发送，与 God.send_messages 的批量发送顺序一致
         """
-        message = {
-            "id": self.node_id,
-            "position": self.position,
-            "velocity": self.velocity,
-            "acceleration": self.acceleration,
-            "group_id": self.group_id,
-            # "neighbor_table": self.neighbor_table,
-            "send_time": time.time()
-        }
-        for neighbor in self.neighbors:
-            # neighbor.store_incoming(self.node_id, message)
-            delayed_send(sender=self, receiver=neighbor, message=message, delay_t=delay)
-            log_msg = f"发送消息至 {neighbor.node_id}: {message}"
-            self.logger.debug(log_msg)
+        # 复制发送时刻的状态，避免接收方看到发送之后的变化；消息只创建一次，所有邻居共用
+        message = Message(self.node_id, *self.position.tolist(), *self.velocity.tolist(),
+                          *self.acceleration.tolist(), self.group_id, self.god.now())
+        logged = self.log.enabled_for(logging.DEBUG)
+        payload = message._asdict() if logged else None
+        for neighbor in sorted(self.neighbors.values(), key=lambda node: node.row):
+            self.god.send_message(self, neighbor, message)
+            if logged:
+                self.log.log(logging.DEBUG, self.camp, self.node_id, "send", message.send_time,
+                             neighbor.node_id, payload)
 
     def _collect_incoming_for_next_cycle(self):
         """
-        本时刻把 incoming_queue 里的新消息全部收集到 buffered_neighbors
+        本时刻一次取走消息总线收件箱里的新消息，收件箱列表直接作为 buffered_neighbors，
         这样下一时刻再处理它们
         """
-        new_msgs = []
-        while not self.incoming_queue.empty():
-            sender_id, message = self.incoming_queue.get()
-            new_msgs.append((sender_id, message))
-        # 把这批新消息存入 buffered_neighbors
-        for sender_id, message in new_msgs:
-            self._update_neighbor_table(sender_id, message)
+        inbox = self.god.bus.drain(self)
+        if inbox:
+            with self._lock:
+                if self.buffered_neighbors:
+                    self.buffered_neighbors.extend(inbox)
+                else:
+                    self.buffered_neighbors = inbox
 
     def stop(self):
         """
@@ -220,9 +232,11 @@ class Node:
           1) 处理上一时刻的消息
           2) 更新自身状态
           3) 发送本时刻的消息
-          4) 收集当前时刻收到的消息 (incoming_queue)，留到下一时刻处理
+          4) 收集当前时刻收到的消息 (消息总线收件箱)，留到下一时刻处理
         """
+        metrics = self.god.metrics
         while self.running:
+            start = metrics.begin()
             # 处理上一时刻的邻居数据
             self._apply_buffered_neighbors()
             # 更新自身运动状态 (如位置、速度)，相当于离散时间一步
@@ -231,42 +245,45 @@ class Node:
             self._msg_send_to_neighbors()
             # 收集本时刻收到的消息，等待下一时刻进行处理
             self._collect_incoming_for_next_cycle()
+            elapsed = metrics.end("node_cycle", start)
+            if elapsed is not None and elapsed > delay:
+                metrics.inc("node_overruns", help_text="节点单轮收发耗时超过发送周期的次数")
             # 暂停1s，进入下一轮
             time.sleep(delay)
 
-    def update_neighbors_by_god(self, new_neighbors):
+    def update_neighbor_delta(self, added, removed):
         """
-        通过god实时更新邻居节点，要从 neighbor_table 里删除那些已经不在 new_neighbors 列表中的“旧邻居”。
-        :param new_neighbors: 实时邻居节点
+        通过god增量更新邻居节点：只处理新增和断开的邻居，断开的邻居同时从 neighbor_table 中删除
+        :param added: 新增的邻居节点
+        :param removed: 断开的邻居节点
         """
         with self._lock:
-            self.neighbors = new_neighbors
-            # 2) 得到新邻居的 ID 集合
-            new_ids = set()
-            for node in new_neighbors:
-                # 如果 node 是 Node 对象，就用 nb.node_id
-                if hasattr(node, 'node_id'):
-                    new_ids.add(node.node_id)
-            # 当前 neighbor_table 中记录的旧邻居
-            old_ids = set(self.neighbor_table.keys())
-            # 做差集，找出那些已经不在新邻居列表里的节点
-            to_remove = old_ids - new_ids
-            # 把差集从 neighbor_table 中删除
-            for rid in to_remove:
-                del self.neighbor_table[rid]
+            for node in added:
+                self.neighbors[node.node_id] = node
+            for node in removed:
+                self.neighbors.pop(node.node_id, None)
+                self.neighbor_table.pop(node.node_id, None)
 
     def update_enemies_by_god(self, new_enemies):
+        """
+        通过god更新探测到的敌方节点（God 本身通过 set_detected_targets 批量下发，这里保留原有接口）
+        :param new_enemies: 探测到的敌方节点
+        """
+        detected = {}
+        for node in new_enemies:
+            if hasattr(node, 'node_id'):
+                detected[node.node_id] = TargetRecord(node.node_id, *node.position.tolist(),
+                                                      *node.velocity.tolist(), *node.acceleration.tolist())
+        self.set_detected_targets(detected)
+
+    def set_detected_targets(self, detected):
+        """
+        替换本节点的探测结果
+        :param detected: 节点ID -> TargetRecord
+        """
         with self._lock:
-            self.enemies = new_enemies
-            self.detected_targets = {}
-            for node in self.enemies:
-                if hasattr(node, 'node_id'):
-                    self.detected_targets[node.node_id] = {
-                        "node_id": node.node_id,
-                        "position": node.position,
-                        "velocity": node.velocity,
-                        "acceleration": node.acceleration
-                    }
-            if self.detected_targets:
-                print(f"Node {self.node_id} detected enemies: {self.detected_targets}")
+            self.detected_targets = detected or NO_TARGETS
+            if self.detected_targets and self.log.enabled_for(logging.INFO):
+                self.log.log(logging.INFO, self.camp, self.node_id, "detect", self.god.now(),
+                             payload=list(self.detected_targets))
 
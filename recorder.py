@@ -0,0 +1,207 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from snapshot import WorldSnapshot
+
+# 文件头：魔数、版本号
+FILE_HEADER = struct.Struct("<4sI")
+MAGIC = b"DGSR"
+VERSION = 1
+# 每个时刻的块头：快照序号、节点数、仿真时间、邻居ID总数、探测目标ID总数
+TICK_HEADER = struct.Struct("<IIdII")
+# 块内按列存放，每列补齐到 8 字节；长度为 "n" 的列每个节点一项，其余列长度由块头给出
+COLUMNS = (
+    ("rows", "<u4", (), "n"),
+    ("node_ids", "<i4", (), "n"),
+    ("camps", "i1", (), "n"),
+    ("pos", "<f4", (2,), "n"),
+    ("vel", "<f4", (2,), "n"),
+    ("acc", "<f4", (2,), "n"),
+    ("neighbor_degree", "<u2", (), "n"),
+    ("neighbor_ids", "<i4", (), "neighbors"),
+    ("detected_degree", "<u2", (), "n"),
+    ("detected_ids", "<i4", (), "detected"),
+)
+
+
+def _padding(nbytes):
+    return -nbytes % 8
+
+
+def index_path(path):
+    """时刻索引文件路径：每个时刻一个 uint64，记录该时刻数据块在数据文件中的偏移"""
+    return path + ".idx"
+
+
+class RunRecorder:
+    """
+    运行记录器：把每个时刻的全局快照追加写入紧凑的列式文件，并维护时刻索引，
+    回放时可以按时刻直接定位，不需要重新仿真
+    """
+
+    def __init__(self, path):
+        """
+        :param path: 数据文件路径，同目录下另存 .idx 索引文件
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._data = open(path, "wb")
+        self._index = open(index_path(path), "wb")
+        self._data.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.ticks = 0
+
+    def record(self, snapshot):
+        """
+        追加记录一个时刻
+        :param snapshot: WorldSnapshot 全局快照
+        """
+        neighbor_ids = [nid for part in snapshot.neighbor_ids for nid in part]
+        detected_ids = [tid for part in snapshot.detected_ids for tid in part]
+        columns = {
+            "rows": snapshot.rows,
+            "node_ids": snapshot.node_ids,
+            "camps": snapshot.camps,
+            "pos": snapshot.pos,
+            "vel": snapshot.vel,
+            "acc": snapshot.acc,
+            "neighbor_degree": [len(part) for part in snapshot.neighbor_ids],
+            "neighbor_ids": neighbor_ids,
+            "detected_degree": [len(part) for part in snapshot.detected_ids],
+            "detected_ids": detected_ids,
+        }
+        offset = self._data.tell()
+        self._data.write(TICK_HEADER.pack(snapshot.seq, len(snapshot), snapshot.time,
+                                          len(neighbor_ids), len(detected_ids)))
+        for name, dtype, _, _ in COLUMNS:
+            raw = np.asarray(columns[name], dtype=dtype).tobytes()
+            self._data.write(raw + bytes(_padding(len(raw))))
+        # 先落盘数据块再写索引，读者看到的索引项总是指向完整的数据块
+        self._data.flush()
+        self._index.write(struct.pack("<Q", offset))
+        self._index.flush()
+        self.ticks += 1
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+
+class RunReader:
+    """
+    运行记录读取器：用内存映射打开数据文件和索引文件，
+    按时刻读取时只解析对应的数据块，定位任意时刻是 O(1) 的，不会把整个记录读入内存
+    """
+
+    def __init__(self, path):
+        """
+        :param path: RunRecorder 生成的数据文件路径
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("运行记录格式错误！")
+        if os.path.getsize(index_path(path)):
+            self._index = np.memmap(index_path(path), dtype="<u8", mode="r")
+        else:
+            self._index = np.zeros(0, dtype="<u8")
+
+    def __len__(self):
+        return len(self._index)
+
+    def snapshot(self, tick):
+        """
+        读取某个时刻的全局快照
+        :param tick: 时刻序号，从 0 开始，支持负数从末尾计
+        :return: WorldSnapshot
+        """
+        offset = int(self._index[tick])
+        seq, n, sim_time, neighbors, detected = TICK_HEADER.unpack_from(self._data, offset)
+        offset += TICK_HEADER.size
+        counts = {"n": n, "neighbors": neighbors, "detected": detected}
+        columns = {}
+        for name, dtype, shape, count in COLUMNS:
+            items = counts[count] * int(np.prod(shape, dtype=int))
+            column = np.frombuffer(self._data, dtype=dtype, count=items, offset=offset)
+            columns[name] = column.reshape((counts[count],) + shape)
+            offset += column.nbytes + _padding(column.nbytes)
+        return WorldSnapshot(seq, sim_time, columns["rows"], columns["node_ids"], columns["camps"],
+                             columns["pos"], columns["vel"], columns["acc"],
+                             _split(columns["neighbor_ids"], columns["neighbor_degree"]),
+                             _split(columns["detected_ids"], columns["detected_degree"]))
+
+    def close(self):
+        self._index = np.zeros(0, dtype="<u8")
+        self._data.close()
+        self._file.close()
+
+
+def _split(ids, degree):
+    if not len(degree):
+        return []
+    return [tuple(part.tolist()) for part in np.split(ids, np.cumsum(degree)[:-1])]
+
+
+class ReplayPlayer:
+    """
+    回放播放器：按固定节拍逐个时刻发布记录中的快照和推送帧，
+    对外提供与 SnapshotBuffer 相同的 current() 接口，可以随时暂停或跳转到任意时刻
+    """
+
+    def __init__(self, reader, stream, period=0.1):
+        """
+        :param reader: RunReader 运行记录读取器
+        :param stream: FrameStream 推送流
+        :param period: 回放时每个时刻的间隔（秒）
+        """
+        self.reader = reader
+        self.stream = stream
+        self.period = period
+        self.tick = 0
+        self.playing = True
+        self._current = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """返回当前回放到的快照"""
+        return self._current
+
+    def seek(self, tick):
+        """
+        跳转到指定时刻
+        :param tick: 时刻序号，超出范围时取最近的有效时刻
+        :return: 实际跳转到的时刻，记录为空时不跳转，返回 None
+        """
+        if not len(self.reader):
+            return None
+        with self._lock:
+            self.tick = min(max(int(tick), 0), len(self.reader) - 1)
+            self._show()
+            return self.tick
+
+    def _show(self):
+        snapshot = self.reader.snapshot(self.tick)
+        self._current = snapshot
+        self.stream.publish(snapshot.time, snapshot.rows, snapshot.node_ids, snapshot.camps,
+                            snapshot.pos, snapshot.vel, snapshot.acc, snapshot.neighbor_ids)
+
+    def run(self):
+        if not len(self.reader):
+            return
+        self.seek(0)
+        while True:
+            time.sleep(self.period)
+            with self._lock:
+                if self.playing and self.tick < len(self.reader) - 1:
+                    self.tick += 1
+                self._show()
+
+    def start(self):
+        """在后台线程中回放"""
+        threading.Thread(target=self.run, daemon=True).start()
@@ -0,0 +1,157 @@
+import os
+
+import numpy as np
+
+from state import CAMP_CODES
+
+# 二进制场景文件（.npy）的记录格式，每个节点一条记录
+SCENARIO = np.dtype([
+    ("node_id", "<i8"),
+    ("camp", "i1"),
+    ("pos", "<f8", (2,)),
+    ("vel", "<f8", (2,)),
+    ("acc", "<f8", (2,)),
+])
+
+
+class Scenario:
+    """
+    批量初始场景：全部节点的 ID、阵营、位置、速度、加速度，按列保存在数组中
+    文件读取和随机生成都直接得到数组，不逐行创建节点，由 God.init_scenario 一次写入状态存储
+    """
+
+    def __init__(self, node_ids, camps, pos, vel, acc):
+        """
+        :param node_ids: 节点ID，长度为 N
+        :param camps: 阵营编码（见 state.CAMP_CODES），长度为 N
+        :param pos: 节点位置，形状为 (N, 2)
+        :param vel: 节点速度，形状为 (N, 2)
+        :param acc: 节点加速度，形状为 (N, 2)
+        """
+        self.node_ids = np.asarray(node_ids, dtype=np.int64).reshape(-1)
+        self.camps = np.asarray(camps, dtype=np.int8).reshape(-1)
+        n = len(self.node_ids)
+        self.pos = np.asarray(pos, dtype=float).reshape(n, 2)
+        self.vel = np.asarray(vel, dtype=float).reshape(n, 2)
+        self.acc = np.asarray(acc, dtype=float).reshape(n, 2)
+        if len(self.camps) != n:
+            raise ValueError("场景中各列的长度不一致！")
+        if not np.isin(self.camps, list(CAMP_CODES.values())).all():
+            raise ValueError("阵营错误！")
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def split(self):
+        """
+        按阵营拆分
+        :return: 阵营 -> (节点ID, 位置, 速度, 加速度)，只包含场景中出现的阵营
+        """
+        parts = {}
+        for camp, code in CAMP_CODES.items():
+            picked = np.flatnonzero(self.camps == code)
+            if len(picked):
+                parts[camp] = (self.node_ids[picked], self.pos[picked], self.vel[picked], self.acc[picked])
+        return parts
+
+    def to_records(self):
+        """转换为 SCENARIO 格式的结构化数组"""
+        records = np.zeros(len(self), dtype=SCENARIO)
+        records["node_id"] = self.node_ids
+        records["camp"] = self.camps
+        records["pos"] = self.pos
+        records["vel"] = self.vel
+        records["acc"] = self.acc
+        return records
+
+
+def _camp_codes(values):
+    """把阵营列（名称或编码）转换为编码数组"""
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int8)
+    codes = np.full(len(values), -2, dtype=np.int8)
+    for camp, code in CAMP_CODES.items():
+        codes[values == camp] = code
+    if (codes == -2).any():
+        raise ValueError("阵营错误！")
+    return codes
+
+
+def load_text(path):
+    """
+    读取文本场景文件，每行一个节点，字段以空白或逗号分隔：
+    node_id color x y vx vy ax ay
+    实例： 1 blue 1.0 1.0 1.0 1.0 0.1 0.1
+    空行和以 # 开头的行会被忽略，第一行如果是表头也会被忽略
+    :param path: 文件路径（config/nodes.txt 或 .csv 文件）
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    # 阵营名称替换为编码后整个文件都是数字，交给 numpy 的文本解析器一次读入
+    for camp, code in CAMP_CODES.items():
+        text = text.replace(camp, str(code))
+    lines = text.replace(",", " ").splitlines()
+    first = next((line for line in lines if line.strip() and not line.lstrip().startswith("#")), None)
+    if first is None:
+        return Scenario([], [], [], [], [])
+    header = not first.split()[0].lstrip("+-").isdigit()
+    try:
+        values = np.loadtxt(lines, comments="#", ndmin=2, skiprows=lines.index(first) + 1 if header else 0)
+    except ValueError:
+        raise ValueError("场景文件格式错误，每行应为 node_id color x y vx vy ax ay！")
+    if values.shape[1] != 8:
+        raise ValueError("场景文件格式错误，每行应为 node_id color x y vx vy ax ay！")
+    return Scenario(values[:, 0].astype(np.int64), values[:, 1].astype(np.int8),
+                    values[:, 2:4], values[:, 4:6], values[:, 6:8])
+
+
+def load_scenario(path):
+    """
+    按扩展名读取场景文件
+      .npy：SCENARIO 格式的结构化数组（二进制，可内存映射）
+      .npz：包含 node_id、camp、pos、vel、acc 五个数组，camp 可以是编码或阵营名称
+      其他：文本格式，见 load_text
+    :param path: 文件路径
+    :return: Scenario
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        records = np.load(path, mmap_mode="r")
+        return Scenario(records["node_id"], records["camp"], records["pos"], records["vel"], records["acc"])
+    if extension == ".npz":
+        with np.load(path) as data:
+            return Scenario(data["node_id"], _camp_codes(data["camp"]), data["pos"], data["vel"], data["acc"])
+    return load_text(path)
+
+
+def save_scenario(path, scenario):
+    """
+    保存场景，.npz 扩展名保存为多个数组，其他扩展名保存为 SCENARIO 格式的 .npy 文件
+    :param path: 文件路径
+    :param scenario: Scenario
+    """
+    if os.path.splitext(path)[1].lower() == ".npz":
+        np.savez(path, node_id=scenario.node_ids, camp=scenario.camps,
+                 pos=scenario.pos, vel=scenario.vel, acc=scenario.acc)
+    else:
+        np.save(path, scenario.to_records())
+
+
+def random_scenario(rng, camp, n,
+                    x_range=(0, 1), y_range=(0, 1),
+                    vx_range=(0, 1), vy_range=(0, 1),
+                    ax_range=(0, 0), ay_range=(0, 1)):
+    """
+    批量随机生成一个阵营的节点，参数含义与 God.init_nodes 的 "random" 方式相同，
+    节点ID为 0 ~ n-1，各分量在给定范围内均匀分布
+    :param rng: numpy 随机数发生器（np.random.Generator）
+    :param camp: 节点阵营，"blue" 或 "red"
+    :param n: 节点个数
+    :return: Scenario
+    """
+    if camp not in CAMP_CODES:
+        raise ValueError("阵营错误！")
+    ranges = np.array([x_range, y_range, vx_range, vy_range, ax_range, ay_range], dtype=float)
+    values = rng.uniform(ranges[:, 0], ranges[:, 1], size=(n, 6))
+    return Scenario(np.arange(n), np.full(n, CAMP_CODES[camp]), values[:, 0:2], values[:, 2:4], values[:, 4:6])
@@ -0,0 +1,180 @@
+import gc
+import threading
+import time
+
+from node_t import delay
+
+
+def _pause_gc():
+    """
+    暂停自动垃圾回收：一个时刻内创建的消息和投递记录大都存活到下一时刻，
+    自动回收会在大规模节点时反复扫描全部存活对象；时刻结束后恢复，新对象只在之后被扫描一次
+    :return: 暂停前是否开启了自动回收
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    return collecting
+
+
+def _resume_gc(collecting):
+    if collecting:
+        gc.enable()
+
+
+class Scheduler:
+    """
+    确定性的锁步仿真调度器
+    用一个线程代替“每个节点一个线程 + God 四个更新线程”，每个时刻按固定顺序执行：
+      1) receive:  各节点处理上一时刻收到的邻居数据
+      2) decide:   决策模块根据全体节点的观测一次下发加速度指令
+      3) movement: 批量推进全部节点的运动状态
+      4) telemetry: 用遥测网关收到的外部节点状态覆盖运动计算的结果（未接入遥测时跳过）
+      5) collision: 检测上一时刻到本时刻运动轨迹上的碰撞与接近
+      6) sensing:  God 进行邻居判定和敌方探测
+      7) send:     各节点向邻居发送本时刻消息
+      8) deliver:  消息总线批量投递到期的消息
+      9) collect:  各节点收集本时刻收到的消息，留到下一时刻处理
+     10) publish:  发布本时刻的全局快照和推送帧
+    仿真时间与墙上时间解耦，realtime=False 时以最快速度推进，便于批量实验
+    """
+
+    def __init__(self, god, period=delay, time_step=1, realtime=True):
+        """
+        :param god: 总控 God 实例
+        :param period: 每个时刻对应的仿真时间（秒），默认与节点发送周期一致
+        :param time_step: 每个时刻的运动计算步长
+        :param realtime: True 表示按墙上时间节拍运行，False 表示尽可能快地运行
+        """
+        self.god = god
+        self.period = period
+        self.time_step = time_step
+        self.realtime = realtime
+        self.tick = 0
+        self.sim_time = 0.0
+        self.running = False
+        self._thread = None
+        self.phases = [
+            ("receive", self._phase_receive),
+            ("decide", self._phase_decide),
+            ("movement", self._phase_movement),
+            ("telemetry", self._phase_telemetry),
+            ("collision", self._phase_collision),
+            ("sensing", self._phase_sensing),
+            ("send", self._phase_send),
+            ("deliver", self._phase_deliver),
+            ("collect", self._phase_collect),
+            ("publish", self._phase_publish),
+        ]
+        # 节点的消息时间戳改用仿真时间
+        god.clock = self.now
+        god.scheduler = self
+
+    def now(self):
+        """返回当前仿真时间"""
+        return self.sim_time
+
+    def _nodes(self):
+        return self.god.blue_nodes + self.god.red_nodes
+
+    def _phase_receive(self):
+        for node in self._nodes():
+            node._apply_buffered_neighbors()
+
+    def _phase_decide(self):
+        self.god.decide()
+
+    def _phase_movement(self):
+        self.god.advance(self.time_step)
+
+    def _phase_telemetry(self):
+        self.god.apply_telemetry()
+
+    def _phase_collision(self):
+        self.god.check_collisions()
+
+    def _phase_sensing(self):
+        self.god.sense()
+
+    def _phase_send(self):
+        self.god.send_messages()
+
+    def _phase_deliver(self):
+        self.god.bus.deliver(self.sim_time)
+
+    def _phase_collect(self):
+        for node in self._nodes():
+            node._collect_incoming_for_next_cycle()
+
+    def _phase_publish(self):
+        self.god.publish_snapshot()
+
+    def step(self):
+        """推进一个时刻"""
+        metrics = self.god.metrics
+        tick_start = metrics.begin()
+        collecting = _pause_gc()
+        try:
+            for name, phase in self.phases:
+                start = metrics.begin()
+                phase()
+                metrics.end(name, start)
+        finally:
+            _resume_gc(collecting)
+        self._finish(tick_start)
+
+    async def step_async(self, overrides):
+        """
+        在事件循环中推进一个时刻，阶段顺序与 step() 相同
+        :param overrides: 阶段名 -> 协程函数，这些阶段改为 await 执行，等待期间事件循环可以处理网络 I/O
+        """
+        metrics = self.god.metrics
+        tick_start = metrics.begin()
+        collecting = _pause_gc()
+        try:
+            for name, phase in self.phases:
+                start = metrics.begin()
+                if name in overrides:
+                    await overrides[name]()
+                else:
+                    phase()
+                metrics.end(name, start)
+        finally:
+            _resume_gc(collecting)
+        self._finish(tick_start)
+
+    def _finish(self, tick_start):
+        metrics = self.god.metrics
+        elapsed = metrics.end("tick", tick_start)
+        if elapsed is not None and elapsed > self.period:
+            metrics.inc("tick_overruns", help_text="单个时刻耗时超过配置周期的次数")
+        self.tick += 1
+        self.sim_time += self.period
+
+    def run(self, ticks=None):
+        """
+        连续推进仿真
+        :param ticks: 推进的时刻数，None 表示一直运行到 stop()
+        """
+        self.running = True
+        start_tick = self.tick
+        start = time.perf_counter()
+        while self.running and (ticks is None or self.tick - start_tick < ticks):
+            self.step()
+            if self.realtime:
+                # 按节拍对齐墙上时间，单个时刻超时则不再等待
+                wait = start + (self.tick - start_tick) * self.period - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+        self.running = False
+
+    def start(self, ticks=None):
+        """在后台线程中运行调度器"""
+        self.running = True
+        self._thread = threading.Thread(target=self.run, args=(ticks,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止调度器，等待当前时刻执行完毕"""
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
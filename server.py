@@ -1,17 +1,53 @@
-from flask import Flask, jsonify, render_template
+import argparse
+import json
+
+from flask import Flask, Response, jsonify, render_template, request
 from god import God
+from recorder import ReplayPlayer, RunReader
+from stream import LENGTH, FrameStream
+from viewport import ViewportCache, view_args
 import threading
 import time
 
 app = Flask(__name__)
 
-# 创建 God 实例
-god = God()
-# 初始化一些节点（比如 5 个蓝色节点、5 个红色节点）
-god.init_nodes("random", "blue", 25,(0,10),(0,10),(0,1),(0,1),(0,0.1),(0,0.1))
-god.init_nodes("random", "red", 25,(150,140),(150,150),(-1,0),(-1,0),(-0.1,0),(-0.1,0))
-# 启动节点线程和邻居更新线程
-god.run()
+god = None
+# 快照来源：仿真时为 god.snapshots，回放时为 ReplayPlayer
+snapshots = None
+# 推送流
+frame_stream = None
+# 回放播放器，仅回放模式下使用
+player = None
+# 视口查询索引，每份快照只建立一次
+viewports = ViewportCache()
+
+
+def start_simulation():
+    """
+    仿真模式：创建 God 实例，初始化节点并启动仿真
+    """
+    global god, snapshots, frame_stream
+    # 创建 God 实例
+    god = God()
+    # 初始化一些节点（比如 5 个蓝色节点、5 个红色节点）
+    god.init_nodes("random", "blue", 25,(0,10),(0,10),(0,1),(0,1),(0,0.1),(0,0.1))
+    god.init_nodes("random", "red", 25,(150,140),(150,150),(-1,0),(-1,0),(-0.1,0),(-0.1,0))
+    # 启动节点线程和邻居更新线程
+    god.run()
+    snapshots = god.snapshots
+    frame_stream = god.stream
+
+
+def start_replay(path):
+    """
+    回放模式：内存映射打开运行记录，按时刻回放，不进行仿真
+    :param path: 运行记录文件路径
+    """
+    global snapshots, frame_stream, player
+    frame_stream = FrameStream()
+    player = ReplayPlayer(RunReader(path), frame_stream)
+    player.start()
+    snapshots = player
 
 @app.route('/')
 def index():
@@ -21,30 +57,118 @@ def index():
 def get_nodes():
     """
     返回所有节点的动态信息，包括坐标和邻居列表
+    数据来自仿真发布的最新快照，不获取任何节点锁，所有节点都属于同一时刻
+    """
+    if snapshots is None:
+        return jsonify({"error": "仿真或回放尚未启动"}), 503
+    snapshot = snapshots.current()
+    if snapshot is None:
+        return jsonify([])
+
+    return jsonify(snapshot.to_records())
+
+
+@app.route('/view', methods=['GET'])
+def view_nodes():
+    """
+    按矩形视口查询节点，参数 x0、y0、x1、y1 为视口范围，不指定时为整个战场
+    视口内节点数不超过 max_nodes 时返回节点明细，否则按 grid × grid 的格子返回聚合后的节点数和质心
     """
-    data = []
-    # 将所有节点合并
-    all_nodes = god.blue_nodes + god.red_nodes
+    if snapshots is None:
+        return jsonify({"error": "仿真或回放尚未启动"}), 503
+    snapshot = snapshots.current()
+    if snapshot is None:
+        return jsonify({"mode": "nodes", "count": 0, "nodes": []})
+    try:
+        box = view_args(snapshot, request.args)
+    except ValueError:
+        return jsonify({"error": "参数格式错误"}), 400
+    return jsonify(viewports.get(snapshot).query(*box))
 
-    for node in all_nodes:
-        with node._lock:
-            neighbor_ids = list(node.neighbor_table.keys())
-            # 根据阵营设置不同的颜色
-            color = 'blue' if node.camp == 'blue' else 'red'
 
-            data.append({
-                "node_id": node.node_id,
-                "camp": node.camp,
-                "color": color,
-                "position": node.position,
-                "velocity": node.velocity,
-                "acceleration": node.acceleration,
-                "neighbor_ids": neighbor_ids
-            })
+@app.route('/stream', methods=['GET'])
+def stream_nodes():
+    """
+    推送节点状态的二进制帧流，每帧前加 4 字节长度
+    只包含状态或邻居有变化的节点，定期发送关键帧；rate 参数为客户端期望的接收频率（次/秒）
+    """
+    if frame_stream is None:
+        return jsonify({"error": "仿真或回放尚未启动"}), 503
+    try:
+        rate = float(request.args.get('rate', 10))
+    except ValueError:
+        rate = float('nan')
+    if not rate > 0:
+        return jsonify({"error": "rate 必须是正数"}), 400
 
-    return jsonify(data)
+    def generate():
+        cursor = None
+        while True:
+            frames, cursor = frame_stream.frames_since(cursor, timeout=1.0)
+            if frames:
+                yield b"".join(LENGTH.pack(len(frame)) + frame for frame in frames)
+            time.sleep(1.0 / rate)
+
+    return Response(generate(), mimetype='application/octet-stream')
+
+
+@app.route('/alerts', methods=['GET'])
+def stream_alerts():
+    """
+    推送碰撞与接近告警事件流，每行一个 JSON 事件（JSON Lines）
+    cursor 参数为已收到的最后一个事件序号，不指定时从缓存中最早的事件开始
+    """
+    if god is None:
+        return jsonify({"error": "当前不是仿真模式"}), 400
+    try:
+        cursor = int(request.args['cursor']) if 'cursor' in request.args else None
+    except ValueError:
+        return jsonify({"error": "参数格式错误"}), 400
+
+    def generate(cursor):
+        while True:
+            events, cursor = god.collisions.events_since(cursor, timeout=1.0)
+            if events:
+                yield "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+
+    return Response(generate(cursor), mimetype='application/x-ndjson')
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    以 Prometheus 文本格式返回运行指标：各阶段耗时、消息收发数、队列长度、超时次数和线程数
+    """
+    if god is None:
+        return Response("# 当前不是仿真模式\n", status=404, mimetype='text/plain')
+    return Response(god.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/replay', methods=['GET'])
+def replay():
+    """
+    回放控制：返回回放进度；tick 参数跳转到指定时刻，playing 参数为 0/1 时暂停/继续
+    """
+    if player is None:
+        return jsonify({"error": "当前不是回放模式"}), 400
+    if 'tick' in request.args:
+        try:
+            tick = int(request.args['tick'])
+        except ValueError:
+            return jsonify({"error": "tick 必须是整数"}), 400
+        player.seek(tick)
+    if 'playing' in request.args:
+        player.playing = request.args['playing'] != '0'
+    return jsonify({"tick": player.tick, "ticks": len(player.reader), "playing": player.playing})
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="无人机地面站")
+    parser.add_argument("--replay", help="回放指定的运行记录文件，不进行仿真")
+    args = parser.parse_args()
+    if args.replay:
+        start_replay(args.replay)
+    else:
+        start_simulation()
     # 直接启动 Flask, 监听 5000 端口
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,190 @@
+import atexit
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detection import detect_targets
+from model import Model
+from spatial import make_index
+from state import FREE
+
+# 放入共享内存的状态列：名称、每行的形状、数据类型
+SHARED_COLUMNS = (
+    ("pos", (2,), np.float64),
+    ("vel", (2,), np.float64),
+    ("acc", (2,), np.float64),
+    ("camp", (), np.int8),
+    ("owner", (), np.int16),
+)
+
+
+def _attach(names, capacity):
+    """在工作进程中按名称挂载共享内存，返回 (共享内存对象, 数组) 字典"""
+    blocks, arrays = {}, {}
+    for name, shape, dtype in SHARED_COLUMNS:
+        blocks[name] = shared_memory.SharedMemory(name=names[name])
+        arrays[name] = np.ndarray((capacity,) + shape, dtype=dtype, buffer=blocks[name].buf)
+    return blocks, arrays
+
+
+def _worker_main(conn, shard, names, capacity, neighbor_distance, detect_radius, engine, model):
+    """
+    工作进程主循环：只负责自己区域内节点的运动计算和感知，结果通过管道返回给协调者
+    """
+    blocks, arrays = _attach(names, capacity)
+    pos, vel, acc, camp, owner = (arrays[name] for name, _, _ in SHARED_COLUMNS)
+    halo = max(neighbor_distance, detect_radius)
+    try:
+        while True:
+            command = conn.recv()
+            if command[0] == "integrate":
+                _, size, time_step = command
+                rows = np.flatnonzero(owner[:size] == shard)
+                pos[rows], vel[rows] = model.step(pos[rows], vel[rows], acc[rows], time_step)
+                conn.send(len(rows))
+            elif command[0] == "sense":
+                _, size, lo, hi = command
+                conn.send(_sense(pos, vel, camp, owner, size, shard, lo, hi, halo,
+                                 neighbor_distance, detect_radius, engine))
+            else:
+                break
+    finally:
+        del pos, vel, acc, camp, owner, arrays
+        for block in blocks.values():
+            block.close()
+
+
+def _sense(pos, vel, camp, owner, size, shard, lo, hi, halo, neighbor_distance, detect_radius, engine):
+    """
+    对本区域拥有的节点做邻居判定和敌方探测
+    参与比较的节点包括本区域节点和边界外 halo 宽度内的幽灵节点
+    :return: (邻居起点行号, 邻居终点行号, 探测方行号, 目标行号)，起点和探测方都属于本区域
+    """
+    x = pos[:size, 0]
+    active = camp[:size] != FREE
+    owned = np.flatnonzero(owner[:size] == shard)
+    local = np.flatnonzero(active & (x >= lo - halo) & (x < hi + halo))
+    nb_src, nb_dst, det_obs, det_tgt = [], [], [], []
+    for code in np.unique(camp[owned]).tolist():
+        mine = owned[camp[owned] == code]
+        same = local[camp[local] == code]
+        others = local[(camp[local] != code)]
+
+        index = make_index(engine, neighbor_distance)
+        index.build(pos[same])
+        qi, ci = index.query_candidates(pos[mine], neighbor_distance)
+        src, dst = mine[qi], same[ci]
+        delta = pos[dst] - pos[src]
+        keep = (src != dst) & (np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2) < neighbor_distance)
+        nb_src.append(src[keep])
+        nb_dst.append(dst[keep])
+
+        obs, tgt = detect_targets(pos[mine], vel[mine], pos[others], detect_radius, engine=engine)
+        det_obs.append(mine[obs])
+        det_tgt.append(others[tgt])
+    empty = [np.empty(0, dtype=np.intp)]
+    return (np.concatenate(nb_src + empty), np.concatenate(nb_dst + empty),
+            np.concatenate(det_obs + empty), np.concatenate(det_tgt + empty))
+
+
+class ShardedEngine:
+    """
+    多进程分区仿真引擎
+    按 x 坐标把战场划分为若干条带，每个条带由一个工作进程负责；状态数组放在共享内存中，
+    工作进程直接读写，不需要复制。感知时每个区域额外读取边界外 halo 宽度内的幽灵节点，
+    保证跨区域的邻居和敌方也能被发现。每个时刻按节点的 x 坐标分位数重新划分条带，
+    节点迁移后各区域的节点数仍保持均衡。God 作为协调者汇总各区域的结果
+    """
+
+    def __init__(self, state, workers, neighbor_distance, detect_radius, engine="grid", model=None):
+        """
+        :param state: FleetState 状态存储，启动后其数组会替换为共享内存数组，之后不能再扩容
+        :param workers: 工作进程数
+        :param neighbor_distance: 邻居判定距离
+        :param detect_radius: 敌方探测半径
+        :param engine: 空间索引引擎，"grid" 或 "brute"
+        :param model: 运动模型 Model，None 表示默认的显式欧拉
+        """
+        if workers < 1:
+            raise ValueError("工作进程数必须大于0！")
+        self.state = state
+        self.workers = workers
+        self.bounds = np.zeros(workers - 1)
+        capacity = state.capacity
+        self._blocks = {}
+        arrays = {}
+        for name, shape, dtype in SHARED_COLUMNS:
+            nbytes = max(1, capacity * int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize)
+            self._blocks[name] = shared_memory.SharedMemory(create=True, size=nbytes)
+            arrays[name] = np.ndarray((capacity,) + shape, dtype=dtype, buffer=self._blocks[name].buf)
+            arrays[name][...] = getattr(state, name) if name != "owner" else -1
+        # 状态存储改用共享内存中的数组，节点视图随之指向共享内存
+        state.pos, state.vel, state.acc, state.camp = arrays["pos"], arrays["vel"], arrays["acc"], arrays["camp"]
+        state.shared = True
+        self.owner = arrays["owner"]
+
+        names = {name: block.name for name, block in self._blocks.items()}
+        context = multiprocessing.get_context("spawn")
+        self._conns, self._procs = [], []
+        for shard in range(workers):
+            parent, child = context.Pipe()
+            proc = context.Process(target=_worker_main, daemon=True,
+                                   args=(child, shard, names, capacity, neighbor_distance, detect_radius, engine,
+                                         model if model is not None else Model()))
+            proc.start()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        self.rebalance()
+        atexit.register(self.close)
+
+    def rebalance(self):
+        """按当前 x 坐标的分位数重新划分条带，使各区域节点数大致相同"""
+        size = self.state.size
+        active = np.flatnonzero(self.state.camp[:size] != FREE)
+        x = self.state.pos[active, 0]
+        if len(active):
+            self.bounds = np.quantile(x, np.linspace(0, 1, self.workers + 1)[1:-1])
+        self.owner[:size] = -1
+        self.owner[active] = np.searchsorted(self.bounds, x, side="right")
+
+    def _broadcast(self, commands):
+        for conn, command in zip(self._conns, commands):
+            conn.send(command)
+        return [conn.recv() for conn in self._conns]
+
+    def integrate(self, time_step):
+        """
+        各工作进程并行推进自己区域内节点的运动状态
+        :param time_step: 计算时间步长
+        """
+        self._broadcast([("integrate", self.state.size, time_step)] * self.workers)
+
+    def sense(self):
+        """
+        按节点的最新位置重新划分区域，再由各工作进程并行完成邻居判定和敌方探测
+        :return: (邻居起点行号, 邻居终点行号, 探测方行号, 目标行号)，均为有向节点对
+        """
+        self.rebalance()
+        edges = np.concatenate(([-np.inf], self.bounds, [np.inf]))
+        results = self._broadcast([("sense", self.state.size, edges[k], edges[k + 1])
+                                   for k in range(self.workers)])
+        return tuple(np.concatenate([result[k] for result in results]) for k in range(4))
+
+    def close(self):
+        """停止工作进程并释放共享内存，状态存储换回普通数组"""
+        if not self._procs:
+            return
+        for conn in self._conns:
+            conn.send(("stop",))
+        for proc in self._procs:
+            proc.join()
+        self._procs, self._conns = [], []
+        for name in ("pos", "vel", "acc", "camp"):
+            setattr(self.state, name, np.array(getattr(self.state, name)))
+        self.state.shared = False
+        self.owner = None
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
@@ -0,0 +1,101 @@
+import numpy as np
+
+from state import CAMP_NAMES
+
+
+class WorldSnapshot:
+    """
+    某一时刻全部节点的只读快照
+    所有数组都是发布时复制出来的只读副本，读者拿到后无需加锁，
+    看到的是同一时刻一致的全局状态
+    """
+
+    def __init__(self, seq, sim_time, rows, node_ids, camps, pos, vel, acc, neighbor_ids, detected_ids):
+        """
+        :param seq: 快照序号
+        :param sim_time: 仿真时间
+        :param rows: 节点在状态存储中的行号
+        :param node_ids: 节点ID
+        :param camps: 阵营编码
+        :param pos: 节点位置，形状为 (N, 2)
+        :param vel: 节点速度，形状为 (N, 2)
+        :param acc: 节点加速度，形状为 (N, 2)
+        :param neighbor_ids: 每个节点的邻居ID元组
+        :param detected_ids: 每个节点探测到的敌方节点ID元组
+        """
+        self.seq = seq
+        self.time = sim_time
+        self.rows = _frozen(rows)
+        self.node_ids = _frozen(node_ids)
+        self.camps = _frozen(camps)
+        self.pos = _frozen(pos)
+        self.vel = _frozen(vel)
+        self.acc = _frozen(acc)
+        self.neighbor_ids = tuple(neighbor_ids)
+        self.detected_ids = tuple(detected_ids)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def to_records(self, indices=None):
+        """
+        转换为 /nodes 接口返回的节点信息列表
+        :param indices: 只转换这些下标的节点，None 表示全部节点
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        indices = np.asarray(indices, dtype=np.intp)
+        rows = indices.tolist()
+        data = []
+        positions = self.pos[indices].tolist()
+        velocities = self.vel[indices].tolist()
+        accelerations = self.acc[indices].tolist()
+        camps = self.camps[indices].tolist()
+        for k, node_id in enumerate(self.node_ids[indices].tolist()):
+            camp = CAMP_NAMES[camps[k]]
+            # 根据阵营设置不同的颜色
+            color = 'blue' if camp == 'blue' else 'red'
+
+            data.append({
+                "node_id": node_id,
+                "camp": camp,
+                "color": color,
+                "position": positions[k],
+                "velocity": velocities[k],
+                "acceleration": accelerations[k],
+                "neighbor_ids": list(self.neighbor_ids[rows[k]])
+            })
+        return data
+
+
+def _frozen(values):
+    array = np.array(values)
+    array.flags.writeable = False
+    return array
+
+
+class SnapshotBuffer:
+    """
+    快照发布点：仿真每个时刻生成一份新快照，然后整体替换引用（copy-on-publish）
+    引用赋值是原子操作，读者任何时候调用 current() 都能拿到一份完整的快照，
+    不需要获取任何仿真锁
+    """
+
+    def __init__(self):
+        self._current = None
+        self._seq = 0
+
+    def publish(self, sim_time, rows, node_ids, camps, pos, vel, acc, neighbor_ids, detected_ids):
+        """
+        生成并发布一份新快照，参数同 WorldSnapshot
+        :return: 新发布的快照
+        """
+        snapshot = WorldSnapshot(self._seq, sim_time, rows, node_ids, camps, pos, vel, acc,
+                                 neighbor_ids, detected_ids)
+        self._seq += 1
+        self._current = snapshot
+        return snapshot
+
+    def current(self):
+        """返回最新发布的快照，尚未发布时返回 None"""
+        return self._current
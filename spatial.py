@@ -0,0 +1,193 @@
+import math
+
+import numpy as np
+
+
+class BruteForceIndex:
+    """
+    暴力遍历的邻居查询引擎，逐对计算距离，与 God 原来的双重循环完全等价。
+    复杂度 O(n²)，只作为参考模式，用于校验其他引擎的查询结果
+    """
+
+    def __init__(self):
+        self.positions = np.empty((0, 2))
+
+    def build(self, positions):
+        """
+        建立索引（暴力模式下只保存位置）
+        :param positions: 节点位置，形状为 (N, 2)
+        """
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+
+    def query_pairs(self, radius):
+        """
+        查询距离小于 radius 的所有节点对
+        :param radius: 查询半径
+        :return: (i, j) 两个下标数组，满足 i < j
+        """
+        points = self.positions.tolist()
+        first, second = [], []
+        for i in range(len(points)):
+            for j in range(i + 1, len(points)):
+                distance = math.sqrt((points[j][0] - points[i][0]) ** 2 + (points[j][1] - points[i][1]) ** 2)
+                if distance < radius:
+                    first.append(i)
+                    second.append(j)
+        return np.array(first, dtype=np.intp), np.array(second, dtype=np.intp)
+
+    def query_box(self, x0, y0, x1, y1):
+        """
+        查询矩形区域 [x0, x1] × [y0, y1] 内的全部节点
+        :return: 节点下标数组（升序）
+        """
+        x, y = self.positions[:, 0], self.positions[:, 1]
+        return np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+
+    def query_candidates(self, points, radius):
+        """
+        查询 points 中每个点附近可能在 radius 以内的节点（暴力模式下返回全部组合）
+        :param points: 查询点，形状为 (M, 2)
+        :param radius: 查询半径
+        :return: (查询点下标, 节点下标)，结果是精确结果的超集，需要调用方再做距离判定
+        """
+        m, n = len(points), len(self.positions)
+        return np.repeat(np.arange(m), n), np.tile(np.arange(n), m)
+
+
+class GridIndex:
+    """
+    均匀哈希网格邻居查询引擎
+    按 cell_size 把平面划分为网格，每个节点只和所在格子及相邻格子里的节点比较距离，
+    节点分布不过分密集时，单次查询接近线性复杂度。每个时刻重新 build 即可
+    """
+
+    # 网格坐标编码为 64 位整数时 x 方向的放大系数
+    _KEY_STRIDE = 1 << 32
+
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError("网格边长必须大于0！")
+        self.cell_size = float(cell_size)
+        self.positions = np.empty((0, 2))
+        self._order = np.empty(0, dtype=np.intp)
+        self._sorted_keys = np.empty(0, dtype=np.int64)
+        self._extent = None  # 节点所占格子的范围，矩形查询时才计算
+
+    def _cells(self, positions):
+        return np.floor(positions / self.cell_size).astype(np.int64)
+
+    def _keys(self, cells):
+        return cells[:, 0] * self._KEY_STRIDE + cells[:, 1]
+
+    def build(self, positions):
+        """
+        建立网格索引：计算每个节点所在格子，并按格子编码排序
+        :param positions: 节点位置，形状为 (N, 2)
+        """
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        keys = self._keys(self._cells(self.positions))
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+        self._extent = None
+
+    def query_candidates(self, points, radius):
+        """
+        找出 points 中每个查询点周围格子内的全部候选节点
+        :param points: 查询点，形状为 (M, 2)
+        :param radius: 查询半径
+        :return: (查询点下标, 节点下标)，结果是精确结果的超集，需要调用方再做距离判定
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        reach = max(1, int(math.ceil(radius / self.cell_size)))
+        offsets = [(dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)]
+        return self._gather(points, offsets)
+
+    def _gather(self, points, offsets):
+        """取出每个查询点所在格子平移 offsets 后的格子内的全部节点"""
+        cells = self._cells(points)
+        queries, candidates = [], []
+        for offset in offsets:
+            target = self._keys(cells + offset)
+            lo = np.searchsorted(self._sorted_keys, target, side="left")
+            hi = np.searchsorted(self._sorted_keys, target, side="right")
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            query = np.repeat(np.arange(len(points)), counts)
+            starts = np.repeat(np.cumsum(counts) - counts, counts)
+            slots = lo[query] + np.arange(total) - starts
+            queries.append(query)
+            candidates.append(self._order[slots])
+        if not queries:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        return np.concatenate(queries), np.concatenate(candidates)
+
+    def query_box(self, x0, y0, x1, y1):
+        """
+        查询矩形区域 [x0, x1] × [y0, y1] 内的全部节点
+        同一列格子的编码是连续的，每列只需两次二分查找就能取出该列落在区域内的全部格子
+        :return: 节点下标数组（升序）
+        """
+        if not len(self.positions):
+            return np.empty(0, dtype=np.intp)
+        if self._extent is None:
+            cells = self._cells(self.positions)
+            self._extent = cells.min(axis=0), cells.max(axis=0)
+        low, high = self._extent
+        (cx0, cy0), (cx1, cy1) = self._cells(np.array([[x0, y0], [x1, y1]], dtype=float))
+        columns = np.arange(max(cx0, low[0]), min(cx1, high[0]) + 1, dtype=np.int64)
+        cy0, cy1 = max(cy0, low[1]), min(cy1, high[1])
+        if not len(columns) or cy0 > cy1:
+            return np.empty(0, dtype=np.intp)
+        lo = np.searchsorted(self._sorted_keys, columns * self._KEY_STRIDE + cy0, side="left")
+        hi = np.searchsorted(self._sorted_keys, columns * self._KEY_STRIDE + cy1, side="right")
+        counts = hi - lo
+        total = int(counts.sum())
+        slots = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        found = self._order[slots]
+        x, y = self.positions[found, 0], self.positions[found, 1]
+        return np.sort(found[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)])
+
+    @staticmethod
+    def _within(points_a, points_b, radius):
+        # 与 God.calculate_distance 同样的计算顺序，保证与暴力模式结果一致
+        delta = points_b - points_a
+        return np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2) < radius
+
+    def query_pairs(self, radius):
+        """
+        查询距离小于 radius 的所有节点对
+        :param radius: 查询半径
+        :return: (i, j) 两个下标数组，满足 i < j
+        """
+        # 格子 A 与 B 的节点对和 B 与 A 的相同，只需查询所在格子和一半的相邻格子，查询次数约减半
+        reach = max(1, int(math.ceil(radius / self.cell_size)))
+        forward = [(dx, dy) for dx in range(0, reach + 1) for dy in range(-reach, reach + 1) if dx > 0 or dy > 0]
+        first, second = self._gather(self.positions, [(0, 0)])
+        keep = first < second
+        first, second = [first[keep]], [second[keep]]
+        if len(self.positions):
+            query, candidate = self._gather(self.positions, forward)
+            first.append(np.minimum(query, candidate))
+            second.append(np.maximum(query, candidate))
+        first, second = np.concatenate(first), np.concatenate(second)
+        keep = self._within(self.positions[first], self.positions[second], radius)
+        first, second = first[keep], second[keep]
+        order = np.lexsort((second, first))
+        return first[order], second[order]
+
+
+def make_index(engine, cell_size):
+    """
+    根据配置创建邻居查询引擎
+    :param engine: "grid" 表示哈希网格，"brute" 表示暴力遍历（参考模式）
+    :param cell_size: 网格边长，一般取邻居判定距离
+    """
+    if engine == "grid":
+        return GridIndex(cell_size)
+    if engine == "brute":
+        return BruteForceIndex()
+    raise ValueError(f"未知的邻居查询引擎: {engine}")
+
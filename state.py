@@ -0,0 +1,102 @@
+import numpy as np
+
+# 阵营编码，-1 表示该行空闲（已被释放）
+CAMP_CODES = {"blue": 0, "red": 1}
+CAMP_NAMES = {code: name for name, code in CAMP_CODES.items()}
+FREE = -1
+
+
+class FleetState:
+    """
+    全部节点的集中式状态存储（数组结构，struct-of-arrays）
+    位置、速度、加速度分别保存在连续的 (N, 2) float64 数组中，另有阵营和节点ID两列。
+    每个 Node 只记录自己所在的行号，读写状态时直接访问这里的数组
+    """
+
+    def __init__(self, capacity=64):
+        self.size = 0  # 已使用的行数
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.acc = np.zeros((capacity, 2))
+        self.camp = np.full(capacity, FREE, dtype=np.int8)
+        self.node_id = np.full(capacity, -1, dtype=np.int64)
+        self.shared = False  # 分区仿真运行期间为 True，此时数组位于共享内存中，不能扩容
+
+    @property
+    def capacity(self):
+        return len(self.pos)
+
+    def _reserve(self, extra):
+        """
+        保证还能再放入 extra 行，容量不足时按倍数扩容
+        注意：扩容会重新分配数组，外部不要长期持有数组切片；分区仿真运行期间容量不足时抛出 ValueError
+        """
+        needed = self.size + extra
+        if needed <= self.capacity:
+            return
+        if self.shared:
+            raise ValueError("分区仿真运行期间状态存储已满，不能扩容！")
+        capacity = max(needed, 2 * self.capacity)
+        for name in ("pos", "vel", "acc"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, 2))
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        camp = np.full(capacity, FREE, dtype=np.int8)
+        camp[:self.size] = self.camp[:self.size]
+        self.camp = camp
+        node_id = np.full(capacity, -1, dtype=np.int64)
+        node_id[:self.size] = self.node_id[:self.size]
+        self.node_id = node_id
+
+    def add(self, node_id, camp, pos, vel, acc):
+        """
+        新增一个节点
+        :param node_id: 节点ID
+        :param camp: 节点阵营，"blue" 或 "red"
+        :param pos: 节点位置[x, y]
+        :param vel: 节点速度[vx, vy]
+        :param acc: 节点加速度[ax, ay]
+        :return: 节点所在行号
+        """
+        return int(self.add_many([node_id], camp, [pos], [vel], [acc])[0])
+
+    def add_many(self, node_ids, camp, pos, vel, acc):
+        """
+        批量新增同一阵营的节点
+        :param node_ids: 节点ID数组，长度为 n
+        :param camp: 节点阵营，"blue" 或 "red"
+        :param pos: 节点位置，形状为 (n, 2)
+        :param vel: 节点速度，形状为 (n, 2)
+        :param acc: 节点加速度，形状为 (n, 2)
+        :return: 新节点的行号数组
+        """
+        if camp not in CAMP_CODES:
+            raise ValueError("阵营错误！")
+        n = len(node_ids)
+        self._reserve(n)
+        rows = np.arange(self.size, self.size + n)
+        self.pos[rows] = np.asarray(pos, dtype=float).reshape(n, 2)
+        self.vel[rows] = np.asarray(vel, dtype=float).reshape(n, 2)
+        self.acc[rows] = np.asarray(acc, dtype=float).reshape(n, 2)
+        self.camp[rows] = CAMP_CODES[camp]
+        self.node_id[rows] = node_ids
+        self.size += n
+        return rows
+
+    def release(self, rows):
+        """
+        释放不再使用的行：标记为空闲并清零速度、加速度，使其不再参与运动计算
+        :param rows: 行号数组
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        self.camp[rows] = FREE
+        self.vel[rows] = 0.0
+        self.acc[rows] = 0.0
+
+    def rows(self, camp):
+        """
+        返回某个阵营全部节点的行号（按加入顺序）
+        :param camp: 节点阵营，"blue" 或 "red"
+        """
+        return np.flatnonzero(self.camp[:self.size] == CAMP_CODES[camp])
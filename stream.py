@@ -0,0 +1,152 @@
+import collections
+import struct
+import threading
+
+import numpy as np
+
+# 帧头：魔数、版本号、标志位、帧序号、仿真时间、节点记录数
+HEADER = struct.Struct("<4sBBIdI")
+MAGIC = b"DGSF"
+VERSION = 1
+FLAG_KEYFRAME = 1
+# 每个节点一条定长记录，邻居ID（uint32）按记录顺序紧跟在全部记录之后
+RECORD = np.dtype([
+    ("row", "<u4"),
+    ("node_id", "<i4"),
+    ("camp", "u1"),
+    ("pos", "<f4", (2,)),
+    ("vel", "<f4", (2,)),
+    ("acc", "<f4", (2,)),
+    ("degree", "<u2"),
+])
+# 每条帧前面加 4 字节长度，便于客户端从字节流中切分
+LENGTH = struct.Struct("<I")
+
+
+def encode_frame(seq, sim_time, records, neighbor_ids, keyframe):
+    """
+    把一批节点记录编码为二进制帧
+    :param seq: 帧序号
+    :param sim_time: 仿真时间
+    :param records: RECORD 类型的结构化数组
+    :param neighbor_ids: 与 records 一一对应的邻居ID列表
+    :param keyframe: 是否为关键帧
+    """
+    flags = FLAG_KEYFRAME if keyframe else 0
+    ids = [nid for part in neighbor_ids for nid in part]
+    return b"".join((
+        HEADER.pack(MAGIC, VERSION, flags, seq, sim_time, len(records)),
+        records.tobytes(),
+        np.asarray(ids, dtype="<u4").tobytes(),
+    ))
+
+
+def decode_frame(frame):
+    """
+    解码二进制帧（主要用于调试和离线分析）
+    :return: (帧头字典, 节点记录, 邻居ID列表)
+    """
+    magic, version, flags, seq, sim_time, count = HEADER.unpack_from(frame)
+    if magic != MAGIC:
+        raise ValueError("帧格式错误！")
+    offset = HEADER.size
+    records = np.frombuffer(frame, dtype=RECORD, count=count, offset=offset)
+    offset += records.nbytes
+    ids = np.frombuffer(frame, dtype="<u4", offset=offset)
+    split = np.split(ids, np.cumsum(records["degree"])[:-1]) if count else []
+    header = {"version": version, "keyframe": bool(flags & FLAG_KEYFRAME), "seq": seq, "time": sim_time}
+    return header, records, [part.tolist() for part in split]
+
+
+class FrameStream:
+    """
+    节点状态推送流
+    仿真每个时刻调用一次 publish()，只编码状态或邻居集合有变化的节点（增量帧），
+    每隔 keyframe_interval 帧发送一次全量关键帧。编码好的帧缓存在环形队列里，
+    所有订阅者共享同一份字节串，订阅者按各自的频率取帧，不会触发重新编码
+    """
+
+    def __init__(self, keyframe_interval=50):
+        self.keyframe_interval = keyframe_interval
+        # 缓存两个关键帧周期，保证队列中总有一个关键帧可以作为起点
+        self._frames = collections.deque(maxlen=2 * keyframe_interval)  # (帧序号, 是否关键帧, 字节串)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._last = np.zeros(0, dtype=RECORD)  # 按行号保存上一次发送的记录
+        self._sent = np.zeros(0, dtype=bool)  # 该行是否发送过
+        self._last_neighbors = {}  # 行号 -> 上一次发送的邻居ID元组
+
+    def publish(self, sim_time, rows, node_ids, camps, pos, vel, acc, neighbor_ids):
+        """
+        发布一个时刻的节点状态
+        :param sim_time: 仿真时间
+        :param rows: 节点在状态存储中的行号
+        :param node_ids: 节点ID
+        :param camps: 阵营编码
+        :param pos: 节点位置，形状为 (N, 2)
+        :param vel: 节点速度，形状为 (N, 2)
+        :param acc: 节点加速度，形状为 (N, 2)
+        :param neighbor_ids: 每个节点的邻居ID列表
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        records = np.zeros(len(rows), dtype=RECORD)
+        records["row"] = rows
+        records["node_id"] = node_ids
+        records["camp"] = camps
+        records["pos"] = pos
+        records["vel"] = vel
+        records["acc"] = acc
+        neighbors = [tuple(ids) for ids in neighbor_ids]
+        records["degree"] = [len(ids) for ids in neighbors]
+
+        keyframe = self._seq % self.keyframe_interval == 0
+        if len(rows) and rows.max() >= len(self._last):
+            size = int(rows.max()) + 1
+            self._last = np.resize(self._last, size)
+            self._sent = np.concatenate((self._sent, np.zeros(size - len(self._sent), dtype=bool)))
+        if keyframe:
+            changed = np.ones(len(rows), dtype=bool)
+        else:
+            last = self._last[rows]
+            changed = ~self._sent[rows]
+            for field in ("node_id", "camp", "pos", "vel", "acc"):
+                diff = records[field] != last[field]
+                changed |= diff.reshape(len(rows), -1).any(axis=1)
+            for k, row in enumerate(rows.tolist()):
+                if not changed[k] and neighbors[k] != self._last_neighbors.get(row):
+                    changed[k] = True
+
+        picked = np.flatnonzero(changed)
+        self._last[rows[picked]] = records[picked]
+        self._sent[rows[picked]] = True
+        for k in picked.tolist():
+            self._last_neighbors[int(rows[k])] = neighbors[k]
+        frame = encode_frame(self._seq, sim_time, records[picked], [neighbors[k] for k in picked.tolist()], keyframe)
+
+        with self._cond:
+            self._frames.append((self._seq, keyframe, frame))
+            self._seq += 1
+            self._cond.notify_all()
+
+    def frames_since(self, cursor, timeout=None):
+        """
+        取出某个订阅者尚未收到的帧，没有新帧时最多等待 timeout 秒
+        积压的帧中如果有关键帧，则从最近的关键帧开始发送；
+        新订阅者或积压过多已被覆盖的订阅者同样从最近的关键帧开始
+        :param cursor: 订阅者已收到的最后一帧序号，None 表示新订阅者
+        :param timeout: 最长等待时间（秒）
+        :return: (帧字节串列表, 新的 cursor)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames and (cursor is None or self._frames[-1][0] > cursor),
+                                       timeout=timeout):
+                return [], cursor
+            pending = [item for item in self._frames if cursor is None or item[0] > cursor]
+            missed = cursor is None or pending[0][0] != cursor + 1
+            keys = [k for k, item in enumerate(pending) if item[1]]
+            if keys:
+                pending = pending[keys[-1]:]
+            elif missed:
+                # 队列中已没有可以衔接的帧，等待下一个关键帧
+                return [], cursor
+            return [item[2] for item in pending], pending[-1][0]
@@ -0,0 +1,185 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+from god import God
+from scheduler import Scheduler
+
+# 参数网格中可以扫描的参数：参数名 -> (配置节, 键名)，None 表示不是配置文件中的参数
+PARAMETERS = {
+    "size": None,
+    "neighbor_distance": ("threshold_distance", "NEIGHBOR_DISTANCE"),
+    "detect_radius": ("detect_radius", "DETECT_RADIUS"),
+    "delay": ("send_delay", "DELAY"),
+    "seed": None,
+}
+# 批量实验固定使用的配置：不写日志、不记录运行过程、单进程计算；
+# 碰撞告警数和时刻耗时取自运行指标，因此始终开启指标
+FIXED_CONFIG = {
+    ("logging", "LEVEL"): "OFF",
+    ("metrics", "ENABLED"): "true",
+    ("recorder", "PATH"): "",
+    ("sharding", "WORKERS"): "0",
+}
+
+# 节点 x 方向速度的上限（每个时刻），y 方向速度在 ±MAX_SPEED / 2 以内
+MAX_SPEED = 1.0
+
+
+def parameter_grid(**values):
+    """
+    生成参数网格中的全部组合
+    :param values: 参数名 -> 取值列表
+    :return: 参数字典列表
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values[name] for name in names))]
+
+
+def run_experiment(params, ticks=100, arena=1000.0):
+    """
+    无界面运行一次仿真并汇总结果
+    红蓝双方各 size 个节点，各占宽 arena / 4 的条带，蓝方在左侧向右、红方在右侧向左相向飞行，
+    由锁步调度器以最快速度推进 ticks 个时刻。两个条带相对的边之间留出 ticks * MAX_SPEED / 2 + 探测半径 的间隔：
+    双方平均以 MAX_SPEED 的相对速度接近，大约在一半时刻时进入探测半径，无论 ticks 和 arena 取多少都能相遇
+    :param params: 参数字典，包含 size、neighbor_distance、detect_radius、delay、seed
+    :param ticks: 推进的时刻数
+    :param arena: 战场边长
+    :return: 结果字典（参数 + 汇总指标）
+    """
+    overrides = dict(FIXED_CONFIG)
+    for name, key in PARAMETERS.items():
+        if key is not None and name in params:
+            overrides[key] = params[name]
+    god = God(seed=params["seed"], overrides=overrides)
+    size = int(params["size"])
+    gap = ticks * MAX_SPEED / 2 + god.detect_radius
+    left, right = arena / 2 - gap / 2, arena / 2 + gap / 2
+    god.init_nodes("bulk", "blue", size, (left - arena / 4, left), (0, arena), (0, MAX_SPEED),
+                   (-MAX_SPEED / 2, MAX_SPEED / 2), (0, 0), (0, 0))
+    god.init_nodes("bulk", "red", size, (right, right + arena / 4), (0, arena), (-MAX_SPEED, 0),
+                   (-MAX_SPEED / 2, MAX_SPEED / 2), (0, 0), (0, 0))
+    scheduler = Scheduler(god, period=god.delay, realtime=False)
+
+    nodes = god.blue_nodes + god.red_nodes
+    first_detection = np.full(len(nodes), np.nan)
+    link_counts = []
+    start = time.perf_counter()
+    for _ in range(ticks):
+        scheduler.step()
+        detecting = np.array([bool(node.detected_targets) for node in nodes])
+        first_detection[detecting & np.isnan(first_detection)] = scheduler.now()
+        link_counts.append(sum(len(links) for links in god.links.values()))
+    elapsed = time.perf_counter() - start
+
+    detected = first_detection[~np.isnan(first_detection)]
+    metrics = god.metrics.phase_stats()
+    result = dict(params)
+    result.update({
+        "ticks": ticks,
+        "sim_time": scheduler.now(),
+        "wall_time": elapsed,
+        "ticks_per_sec": ticks / elapsed if elapsed else float("inf"),
+        "first_detection": float(detected.min()) if len(detected) else None,
+        "median_detection": float(np.median(detected)) if len(detected) else None,
+        "detected_fraction": len(detected) / len(nodes) if nodes else 0.0,
+        "mean_links": float(np.mean(link_counts)) if link_counts else 0.0,
+        "final_links": link_counts[-1] if link_counts else 0,
+        "collision_alerts": god.metrics.counter("collision_alerts"),
+        "messages_sent": god.bus.sent,
+        "messages_delivered": god.bus.delivered,
+        "messages_dropped": god.bus.dropped,
+        "mean_tick_ms": 1000.0 * metrics["tick"][1] / metrics["tick"][0] if "tick" in metrics else None,
+    })
+    return result
+
+
+def _run(args):
+    params, ticks, arena = args
+    try:
+        return run_experiment(params, ticks, arena)
+    except Exception as e:
+        result = dict(params)
+        result["error"] = repr(e)
+        return result
+
+
+def run_sweep(grid, ticks=100, arena=1000.0, workers=None, output=None):
+    """
+    用进程池并行运行参数网格中的全部实验，结果按完成顺序写入 CSV 表格
+    :param grid: 参数字典列表，见 parameter_grid
+    :param ticks: 每次实验推进的时刻数
+    :param arena: 战场边长
+    :param workers: 进程数，None 表示 CPU 核数
+    :param output: 结果 CSV 文件路径，None 表示不写文件
+    :return: 结果字典列表，顺序与 grid 相同
+    """
+    context = multiprocessing.get_context("spawn")
+    results = [None] * len(grid)
+    writer = None
+    f = open(output, "w", newline="", encoding="utf-8") if output else None
+    try:
+        with context.Pool(workers) as pool:
+            jobs = [(params, ticks, arena) for params in grid]
+            for done, (k, result) in enumerate(pool.imap_unordered(_indexed, enumerate(jobs)), 1):
+                results[k] = result
+                print(f"[{done}/{len(grid)}] {_describe(result)}", file=sys.stderr)
+                if f is not None:
+                    if writer is None:
+                        writer = csv.DictWriter(f, fieldnames=_columns(), extrasaction="ignore")
+                        writer.writeheader()
+                    writer.writerow(result)
+                    f.flush()
+    finally:
+        if f is not None:
+            f.close()
+    return results
+
+
+def _indexed(item):
+    k, job = item
+    return k, _run(job)
+
+
+def _columns():
+    return list(PARAMETERS) + ["ticks", "sim_time", "wall_time", "ticks_per_sec", "first_detection",
+                               "median_detection", "detected_fraction", "mean_links", "final_links",
+                               "collision_alerts", "messages_sent", "messages_delivered", "messages_dropped",
+                               "mean_tick_ms", "error"]
+
+
+def _describe(result):
+    params = ", ".join(f"{name}={result[name]}" for name in PARAMETERS if name in result)
+    if "error" in result:
+        return f"{params}: 失败 {result['error']}"
+    return f"{params}: {result['ticks_per_sec']:.1f} 时刻/秒, 探测比例 {result['detected_fraction']:.2f}"
+
+
+def _values(text, kind):
+    return [kind(value) for value in text.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="无界面批量实验：按参数网格并行运行多次仿真，汇总结果表格")
+    parser.add_argument("--sizes", default="100", help="每个阵营的节点数，逗号分隔")
+    parser.add_argument("--neighbor-distance", default="20", help="邻居判定距离，逗号分隔")
+    parser.add_argument("--detect-radius", default="50", help="敌方探测半径，逗号分隔")
+    parser.add_argument("--delay", default="1.0", help="节点发送周期（每个时刻的仿真时间），逗号分隔")
+    parser.add_argument("--seeds", default="0", help="随机种子，逗号分隔")
+    parser.add_argument("--ticks", type=int, default=100, help="每次实验推进的时刻数")
+    parser.add_argument("--arena", type=float, default=1000.0, help="战场边长")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认等于 CPU 核数")
+    parser.add_argument("--output", default="sweep.csv", help="结果 CSV 文件")
+    args = parser.parse_args()
+    experiments = parameter_grid(size=_values(args.sizes, int),
+                                 neighbor_distance=_values(args.neighbor_distance, float),
+                                 detect_radius=_values(args.detect_radius, float),
+                                 delay=_values(args.delay, float),
+                                 seed=_values(args.seeds, int))
+    run_sweep(experiments, args.ticks, args.arena, args.workers, args.output)
+    print(f"已完成 {len(experiments)} 次实验，结果写入 {args.output}")
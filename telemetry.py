@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import collections
+import socket
+import struct
+import time
+
+import numpy as np
+
+from scenario import SCENARIO, Scenario
+from state import CAMP_CODES
+
+# 数据报头：魔数、版本号、保留字节、节点记录数；其后紧跟 count 条 scenario.SCENARIO 格式的定长记录
+HEADER = struct.Struct("<4sBxH")
+MAGIC = b"DGST"
+VERSION = 1
+# 单个数据报携带的记录数上限，保证数据报不超过常见链路的 MTU（约 1400 字节）
+MAX_RECORDS = (1400 - HEADER.size) // SCENARIO.itemsize
+# 尚未写入状态存储的数据报上限，超出时丢弃最早的数据报
+MAX_PENDING = 65536
+# 套接字接收缓冲区大小：仿真计算一个时刻期间事件循环无法读取数据报，由内核缓冲区暂存
+# （实际大小受系统 net.core.rmem_max 限制）
+RECV_BUFFER = 8 << 20
+# 每次套接字可读时最多连续读取的数据报数，避免长时间占用事件循环
+RECV_BATCH = 4096
+
+
+def encode_packet(records):
+    """
+    把一批节点状态编码为遥测数据报
+    :param records: SCENARIO 格式的结构化数组，不超过 MAX_RECORDS 条
+    """
+    records = np.asarray(records, dtype=SCENARIO)
+    if len(records) > MAX_RECORDS:
+        raise ValueError(f"单个数据报最多携带 {MAX_RECORDS} 条记录！")
+    return HEADER.pack(MAGIC, VERSION, len(records)) + records.tobytes()
+
+
+def decode_packet(data):
+    """
+    解码遥测数据报
+    :return: SCENARIO 格式的结构化数组（只读，直接引用数据报的内存）
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("数据报长度错误！")
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("数据报格式错误！")
+    if len(data) != HEADER.size + count * SCENARIO.itemsize:
+        raise ValueError("数据报长度错误！")
+    return np.frombuffer(data, dtype=SCENARIO, count=count, offset=HEADER.size)
+
+
+class TelemetryGateway:
+    """
+    遥测网关：接收外部无人机（实体无人机或本地替身仿真）上报的状态，写入仿真使用的同一个状态存储
+    收到数据报时只放入缓冲区，不做解析；仿真每个时刻调用一次 apply()，把积压的数据报一次解码、
+    去重后批量写入状态数组。首次上报的节点按阵营加入仿真，之后与仿真节点一样参与邻居判定、探测和消息收发
+    """
+
+    def __init__(self, god, max_pending=MAX_PENDING):
+        """
+        :param god: 总控 God 实例
+        :param max_pending: 缓冲区中数据报的上限
+        """
+        self.god = god
+        self._packets = collections.deque(maxlen=max_pending)
+        self._rows = {}  # (节点ID * 阵营数 + 阵营编码) -> 行号
+        # 统计信息
+        self.received = 0
+        self.dropped = 0
+        self.malformed = 0
+        self.updates = 0
+        self.joined = 0
+        god.telemetry = self
+        metrics = god.metrics
+        metrics.register("telemetry_packets", lambda: self.received, "收到的遥测数据报数", kind="counter")
+        metrics.register("telemetry_dropped", lambda: self.dropped, "缓冲区溢出丢弃的遥测数据报数", kind="counter")
+        metrics.register("telemetry_malformed", lambda: self.malformed, "格式错误的遥测数据报数", kind="counter")
+        metrics.register("telemetry_updates", lambda: self.updates, "写入状态存储的遥测记录数", kind="counter")
+        metrics.register("telemetry_nodes", lambda: self.joined, "通过遥测加入的外部节点数")
+        metrics.register("telemetry_pending", self.pending, "尚未写入状态存储的遥测数据报数")
+
+    def receive(self, data):
+        """
+        收下一个数据报，只放入缓冲区
+        :param data: 数据报内容
+        """
+        self.received += 1
+        if len(self._packets) == self._packets.maxlen:
+            self.dropped += 1
+        self._packets.append(data)
+
+    def pending(self):
+        """返回缓冲区中的数据报数"""
+        return len(self._packets)
+
+    def apply(self):
+        """
+        把缓冲区中的全部数据报写入状态存储，同一节点在一批中多次上报时只保留最后一条
+        :return: 本次写入的节点数
+        """
+        parts = []
+        for _ in range(len(self._packets)):
+            try:
+                parts.append(decode_packet(self._packets.popleft()))
+            except ValueError:
+                self.malformed += 1
+        if not parts:
+            return 0
+        records = np.concatenate(parts)
+        records = records[np.isin(records["camp"], list(CAMP_CODES.values()))]
+        keys = records["node_id"] * len(CAMP_CODES) + records["camp"]
+        _, last = np.unique(keys[::-1], return_index=True)
+        picked = np.sort(len(keys) - 1 - last)
+        records, keys = records[picked], keys[picked]
+
+        rows = self._lookup(records, keys)
+        if (rows < 0).any():
+            # 有未知节点或行号已失效时重建索引，仍找不到的节点作为新节点加入
+            self._reindex()
+            rows = self._lookup(records, keys)
+            new = np.flatnonzero(rows < 0)
+            if len(new):
+                joined = records[new]
+                added = self.god.add_nodes(Scenario(joined["node_id"], joined["camp"], joined["pos"],
+                                                    joined["vel"], joined["acc"]))
+                self._rows.update(zip(keys[new].tolist(), added.tolist()))
+                self.joined += len(new)
+                records, rows = records[rows >= 0], rows[rows >= 0]
+        state = self.god.state
+        state.pos[rows] = records["pos"]
+        state.vel[rows] = records["vel"]
+        state.acc[rows] = records["acc"]
+        self.updates += len(picked)
+        return len(picked)
+
+    def _lookup(self, records, keys):
+        """按索引查找行号，找不到或该行已属于其他节点时为 -1"""
+        rows = np.fromiter((self._rows.get(key, -1) for key in keys.tolist()), dtype=np.intp, count=len(keys))
+        state = self.god.state
+        known = rows >= 0
+        stale = known.copy()
+        stale[known] = ((state.node_id[rows[known]] != records["node_id"][known])
+                        | (state.camp[rows[known]] != records["camp"][known]))
+        rows[stale] = -1
+        return rows
+
+    def _reindex(self):
+        """根据状态存储重建 节点 -> 行号 索引"""
+        state = self.god.state
+        rows = np.flatnonzero(state.camp[:state.size] >= 0)
+        keys = state.node_id[rows] * len(CAMP_CODES) + state.camp[rows]
+        self._rows = dict(zip(keys.tolist(), rows.tolist()))
+
+
+class TelemetryListener:
+    """
+    UDP 遥测接收：非阻塞套接字注册到事件循环，可读时一次读空内核中积压的数据报（每次至多 RECV_BATCH 个），
+    只交给网关缓冲，不解析，不为发送方创建连接或线程
+    """
+
+    def __init__(self, gateway, host, port):
+        """
+        :param gateway: TelemetryGateway
+        :param host: 监听地址
+        :param port: 监听端口
+        """
+        self.gateway = gateway
+        family, kind, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        self.sock = socket.socket(family, kind, proto)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+        except OSError:
+            pass
+        self.sock.bind(address)
+        self.sock.setblocking(False)
+        self._loop = None
+
+    def start(self, loop):
+        """在事件循环中开始接收"""
+        self._loop = loop
+        loop.add_reader(self.sock.fileno(), self._read_ready)
+
+    def _read_ready(self):
+        receive = self.gateway.receive
+        for _ in range(RECV_BATCH):
+            try:
+                data = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            receive(data)
+
+    def close(self):
+        """停止接收并关闭套接字"""
+        if self._loop is not None:
+            self._loop.remove_reader(self.sock.fileno())
+            self._loop = None
+        self.sock.close()
+
+
+async def listen(gateway, host, port):
+    """
+    在当前事件循环中监听 UDP 遥测端口
+    :return: TelemetryListener，close() 停止监听
+    """
+    listener = TelemetryListener(gateway, host, port)
+    listener.start(asyncio.get_running_loop())
+    return listener
+
+
+async def simulate(host, port, n=1000, camp="blue", rate=10.0, first_id=100000, area=(0, 1000), seed=None,
+                   duration=None):
+    """
+    本地替身仿真：模拟 n 架外部无人机匀速飞行，按 rate 次/秒把全部状态打包成批量数据报发送到遥测网关
+    :param host: 遥测网关地址
+    :param port: 遥测网关端口
+    :param n: 无人机数量
+    :param camp: 阵营
+    :param rate: 每秒上报次数
+    :param first_id: 第一架无人机的节点ID，与仿真节点的ID错开
+    :param area: 初始位置的坐标范围
+    :param seed: 随机种子
+    :param duration: 运行时长（秒），None 表示一直运行
+    :return: 已发送的数据报数
+    """
+    rng = np.random.default_rng(seed)
+    records = np.zeros(n, dtype=SCENARIO)
+    records["node_id"] = np.arange(first_id, first_id + n)
+    records["camp"] = CAMP_CODES[camp]
+    records["pos"] = rng.uniform(*area, size=(n, 2))
+    records["vel"] = rng.uniform(-1, 1, size=(n, 2))
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+    sent = 0
+    start = loop.time()
+    tick = 0
+    try:
+        while duration is None or loop.time() - start < duration:
+            records["pos"] += records["vel"] / rate
+            for offset in range(0, n, MAX_RECORDS):
+                transport.sendto(encode_packet(records[offset:offset + MAX_RECORDS]))
+                sent += 1
+            tick += 1
+            await asyncio.sleep(max(start + tick / rate - loop.time(), 0))
+    finally:
+        transport.close()
+    return sent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地替身仿真：向地面站的 UDP 遥测网关批量发送外部无人机状态")
+    parser.add_argument("--host", default="127.0.0.1", help="遥测网关地址")
+    parser.add_argument("--port", type=int, default=9000, help="遥测网关端口")
+    parser.add_argument("--drones", type=int, default=1000, help="无人机数量")
+    parser.add_argument("--camp", default="blue", choices=list(CAMP_CODES), help="阵营")
+    parser.add_argument("--rate", type=float, default=10.0, help="每秒上报次数")
+    parser.add_argument("--first-id", type=int, default=100000, help="第一架无人机的节点ID")
+    parser.add_argument("--duration", type=float, default=None, help="运行时长（秒），默认一直运行")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    try:
+        count = asyncio.run(simulate(args.host, args.port, args.drones, args.camp, args.rate, args.first_id,
+                                     duration=args.duration))
+        elapsed = time.perf_counter() - started
+        print(f"已发送 {count} 个数据报，{count / elapsed:.0f} 个/秒")
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,208 @@
+"""
+仿真核心性能基准
+按不同节点规模构建红蓝双方节点，分阶段计时：运动计算、邻居判定、敌方探测、消息收发、/nodes 快照序列化，
+输出机器可读的 JSON 报告（每秒时刻数、单个时刻耗时的 p50/p99、峰值内存、平均每个节点占用的内存），便于在不同提交之间对比
+
+用法：python test/benchmark.py --sizes 50,500,5000,50000 --ticks 20 --output bench.json
+"""
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+# 从 test 目录运行时，让主目录下的模块可以被导入
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+import numpy as np  # noqa: E402
+
+from god import God  # noqa: E402
+from log_sink import OFF  # noqa: E402
+from model import Model  # noqa: E402
+
+PHASES = ("movement", "movement_batch", "neighbors", "enemies", "messages", "snapshot")
+
+
+def build_fleet(n, density, seed):
+    """
+    用 God.init_nodes 随机生成红蓝双方各 n 个节点
+    战场边长随规模增大，使节点密度（平均邻居数）保持不变
+    :param n: 每个阵营的节点数
+    :param density: 每个阵营单位面积内的节点数
+    :param seed: 随机种子
+    """
+    god = God(seed=seed)
+    god.log_sink.level = OFF
+    # 不使用实时时钟，消息时间戳与运行快慢无关
+    god.clock = lambda: 0.0
+    side = math.sqrt(n / density)
+    god.init_nodes("random", "blue", n, (0, side), (0, side), (-1, 1), (-1, 1), (-0.1, 0.1), (-0.1, 0.1))
+    god.init_nodes("random", "red", n, (0, side), (0, side), (-1, 1), (-1, 1), (-0.1, 0.1), (-0.1, 0.1))
+    return god
+
+
+def run_tick(god):
+    """
+    执行一个完整时刻，返回各阶段耗时（秒）
+    movement 为逐节点调用 Model.calculate_movement，movement_batch 为 God.advance（按配置的积分器调用 Model.advance），
+    两者只计时、不重复推进：逐节点计算之后把状态恢复，再由批量计算真正推进
+    """
+    nodes = god.blue_nodes + god.red_nodes
+    timings = {}
+
+    saved = (god.state.pos.copy(), god.state.vel.copy())
+    start = time.perf_counter()
+    for node in nodes:
+        Model.calculate_movement(node, 1)
+    timings["movement"] = time.perf_counter() - start
+    god.state.pos[...], god.state.vel[...] = saved
+
+    start = time.perf_counter()
+    god.advance(1)
+    timings["movement_batch"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    god.refresh_neighbors(god.blue_nodes)
+    god.refresh_neighbors(god.red_nodes)
+    timings["neighbors"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    god.refresh_enemies()
+    timings["enemies"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for node in nodes:
+        node._apply_buffered_neighbors()
+    god.send_messages()
+    god.bus.deliver(god.now())
+    for node in nodes:
+        node._collect_incoming_for_next_cycle()
+    timings["messages"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    snapshot = god.publish_snapshot()
+    json.dumps(snapshot.to_records())
+    timings["snapshot"] = time.perf_counter() - start
+    return timings
+
+
+def current_rss():
+    """当前进程的常驻内存（字节），只支持 Linux，其他平台返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _percentiles(values):
+    values = np.asarray(values) * 1000.0
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p99_ms": float(np.percentile(values, 99)),
+    }
+
+
+def bench_size(n, ticks, density, seed):
+    """
+    对单个规模运行基准
+    :return: 该规模的结果字典
+    """
+    gc.collect()
+    rss_before = current_rss()
+    start = time.perf_counter()
+    god = build_fleet(n, density, seed)
+    build_time = time.perf_counter() - start
+
+    # 先跑一个时刻预热（建立邻居关系、填充消息队列）
+    run_tick(god)
+    gc.collect()
+    rss_after = current_rss()
+    samples = {phase: [] for phase in PHASES}
+    totals = []
+    for _ in range(ticks):
+        timings = run_tick(god)
+        for phase in PHASES:
+            samples[phase].append(timings[phase])
+        # movement 只用于对比逐节点与批量计算，不计入时刻耗时
+        totals.append(sum(timings[phase] for phase in PHASES if phase != "movement"))
+
+    links = sum(len(links) for links in god.links.values())
+    return {
+        "nodes": 2 * n,
+        "ticks": ticks,
+        "build_s": build_time,
+        "ticks_per_sec": ticks / sum(totals),
+        "tick": _percentiles(totals),
+        "phases": {phase: _percentiles(samples[phase]) for phase in PHASES},
+        "links": links,
+        "messages_delivered": god.bus.delivered,
+        # Linux 下 ru_maxrss 的单位是 KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        # 建立节点并运行一个时刻后增加的常驻内存，平均到每个节点
+        "memory_per_drone_kb": ((rss_after - rss_before) / (2 * n) / 1024.0
+                                if rss_before is not None and rss_after is not None else None),
+    }
+
+
+def _bench_in_child(args):
+    return bench_size(*args)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=root_directory,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="仿真核心性能基准")
+    parser.add_argument("--sizes", default="50,500,5000,50000",
+                        help="节点总数列表，逗号分隔，红蓝双方各占一半")
+    parser.add_argument("--ticks", type=int, default=20, help="每个规模计时的时刻数")
+    parser.add_argument("--density", type=float, default=0.004, help="每个阵营单位面积内的节点数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", help="报告输出文件，默认输出到标准输出")
+    args = parser.parse_args()
+
+    results = []
+    # 每个规模在独立进程中运行，峰值内存互不影响
+    context = multiprocessing.get_context("spawn")
+    for size in (int(s) for s in args.sizes.split(",")):
+        with context.Pool(1) as pool:
+            result = pool.apply(_bench_in_child, ((max(1, size // 2), args.ticks, args.density, args.seed),))
+        results.append(result)
+        print(f"{result['nodes']:>7} 个节点: {result['ticks_per_sec']:.2f} 时刻/秒, "
+              f"p50 {result['tick']['p50_ms']:.2f} ms, p99 {result['tick']['p99_ms']:.2f} ms, "
+              f"峰值内存 {result['peak_rss_mb']:.1f} MB", file=sys.stderr)
+        if result["memory_per_drone_kb"] is not None:
+            print(f"{'':>7} 平均每个节点 {result['memory_per_drone_kb']:.2f} KB", file=sys.stderr)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
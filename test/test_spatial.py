@@ -0,0 +1,64 @@
+"""
+邻居查询引擎和批量探测与参考实现的一致性：
+GridIndex 与 BruteForceIndex 的节点对、矩形查询结果相同，detection.detect_pairs 与逐对调用 Node.detect_enemy 的结果相同
+
+用法：python -m pytest test/test_spatial.py
+"""
+import os
+import sys
+
+# 从 test 目录运行时，让主目录下的模块可以被导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from detection import detect_pairs  # noqa: E402
+from god import God  # noqa: E402
+from log_sink import OFF  # noqa: E402
+from spatial import BruteForceIndex, GridIndex  # noqa: E402
+
+
+def _indexes(positions, cell_size):
+    grid, brute = GridIndex(cell_size), BruteForceIndex()
+    grid.build(positions)
+    brute.build(positions)
+    return grid, brute
+
+
+def test_grid_pairs_match_brute_force():
+    rng = np.random.default_rng(1)
+    for n, radius, cell_size in ((500, 7.0, 7.0), (500, 7.0, 3.0), (500, 7.0, 20.0), (1, 5.0, 5.0), (0, 5.0, 5.0)):
+        positions = rng.uniform(-50, 50, size=(n, 2))
+        grid, brute = _indexes(positions, cell_size)
+        first, second = grid.query_pairs(radius)
+        expected_first, expected_second = brute.query_pairs(radius)
+        assert first.tolist() == expected_first.tolist()
+        assert second.tolist() == expected_second.tolist()
+
+
+def test_grid_box_matches_brute_force():
+    rng = np.random.default_rng(2)
+    positions = rng.uniform(0, 100, size=(800, 2))
+    grid, brute = _indexes(positions, 6.0)
+    for _ in range(50):
+        x0, x1 = np.sort(rng.uniform(-10, 110, size=2))
+        y0, y1 = np.sort(rng.uniform(-10, 110, size=2))
+        assert grid.query_box(x0, y0, x1, y1).tolist() == brute.query_box(x0, y0, x1, y1).tolist()
+
+
+def test_detect_pairs_matches_detect_enemy():
+    god = God(seed=3)
+    god.log_sink.level = OFF
+    god.init_nodes("random", "blue", 150, (0, 120), (0, 120), (-1, 1), (-1, 1), (0, 0), (0, 0))
+    god.init_nodes("random", "red", 150, (0, 120), (0, 120), (-1, 1), (-1, 1), (0, 0), (0, 0))
+    blue, red = god.blue_nodes, god.red_nodes
+    state = god.state
+    rows_blue = [node.row for node in blue]
+    rows_red = [node.row for node in red]
+    (b_obs, b_tgt), (r_obs, r_tgt) = detect_pairs(state.pos[rows_blue], state.vel[rows_blue],
+                                                  state.pos[rows_red], state.vel[rows_red], god.detect_radius)
+    expected_blue = {(i, j) for i, node in enumerate(blue) for j, enemy in enumerate(red) if node.detect_enemy(enemy)}
+    expected_red = {(j, i) for j, node in enumerate(red) for i, enemy in enumerate(blue) if node.detect_enemy(enemy)}
+    assert expected_blue and expected_red
+    assert set(zip(b_obs.tolist(), b_tgt.tolist())) == expected_blue
+    assert set(zip(r_obs.tolist(), r_tgt.tolist())) == expected_red
@@ -0,0 +1,19 @@
+"""
+批量实验的默认布局：默认参数下红蓝双方应当相遇并产生探测结果，否则扫描结果没有意义
+
+用法：python -m pytest test/test_sweep.py
+"""
+import os
+import sys
+
+# 从 test 目录运行时，让主目录下的模块可以被导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sweep import run_experiment  # noqa: E402
+
+
+def test_default_run_records_detections():
+    result = run_experiment({"size": 50, "seed": 1})
+    assert "error" not in result
+    assert result["first_detection"] is not None
+    assert result["detected_fraction"] > 0
@@ -0,0 +1,122 @@
+import math
+import threading
+
+import numpy as np
+
+from spatial import GridIndex
+from state import CAMP_CODES
+
+# 单次查询返回的节点数上限，超过时改为返回聚合后的格子
+MAX_NODES = 2000
+# 聚合时每个方向的格子数上限，保证返回的数据量与节点总数无关
+MAX_GRID = 256
+
+
+class ViewportIndex:
+    """
+    视口查询索引：对一份快照建立网格索引，按矩形视口取出可见节点
+    视口内节点较少时返回节点明细；缩小视图、节点过多时按 grid × grid 的格子聚合，
+    返回每个非空格子的节点数和质心，数据量不超过 grid² 个格子
+    """
+
+    def __init__(self, snapshot):
+        """
+        :param snapshot: WorldSnapshot 快照
+        """
+        self.snapshot = snapshot
+        pos = snapshot.pos
+        # 网格边长按平均每格约 4 个节点选取
+        if len(pos):
+            extent = np.maximum(pos.max(axis=0) - pos.min(axis=0), 1e-9)
+            cell_size = max(math.sqrt(float(extent[0] * extent[1]) * 4 / len(pos)), float(extent.max()) / 4096)
+        else:
+            cell_size = 1.0
+        self.index = GridIndex(cell_size)
+        self.index.build(pos)
+
+    def query(self, x0, y0, x1, y1, max_nodes=MAX_NODES, grid=64):
+        """
+        查询矩形视口 [x0, x1] × [y0, y1]
+        :param max_nodes: 返回节点明细的节点数上限
+        :param grid: 聚合时每个方向的格子数
+        :return: 可序列化为 JSON 的字典，mode 为 "nodes"（节点明细）或 "clusters"（聚合格子）
+        """
+        found = self.index.query_box(x0, y0, x1, y1)
+        result = {"time": self.snapshot.time, "box": [x0, y0, x1, y1], "count": len(found)}
+        if len(found) <= max_nodes:
+            result["mode"] = "nodes"
+            result["nodes"] = self.snapshot.to_records(found)
+            return result
+
+        grid = max(1, min(int(grid), MAX_GRID))
+        width = max(x1 - x0, 1e-9) / grid
+        height = max(y1 - y0, 1e-9) / grid
+        pos = self.snapshot.pos[found]
+        ix = np.minimum(((pos[:, 0] - x0) / width).astype(np.int64), grid - 1)
+        iy = np.minimum(((pos[:, 1] - y0) / height).astype(np.int64), grid - 1)
+        cells = ix * grid + iy
+        counts = np.bincount(cells, minlength=grid * grid)
+        occupied = np.flatnonzero(counts)
+        sum_x = np.bincount(cells, weights=pos[:, 0], minlength=grid * grid)[occupied]
+        sum_y = np.bincount(cells, weights=pos[:, 1], minlength=grid * grid)[occupied]
+        camps = self.snapshot.camps[found]
+        per_camp = {camp: np.bincount(cells[camps == code], minlength=grid * grid)[occupied].tolist()
+                    for camp, code in CAMP_CODES.items()}
+        total = counts[occupied]
+
+        clusters = []
+        for k, (cell, count, cx, cy) in enumerate(zip(occupied.tolist(), total.tolist(),
+                                                      (sum_x / total).tolist(), (sum_y / total).tolist())):
+            cluster = {"cell": [cell // grid, cell % grid], "count": count, "position": [cx, cy]}
+            for camp in per_camp:
+                cluster[camp] = per_camp[camp][k]
+            clusters.append(cluster)
+        result["mode"] = "clusters"
+        result["grid"] = grid
+        result["cell_size"] = [width, height]
+        result["clusters"] = clusters
+        return result
+
+
+def view_args(snapshot, args):
+    """
+    解析视口查询参数，x0、y0、x1、y1 为视口范围，未指定完整视口时以全部节点的范围作为视口
+    :param snapshot: WorldSnapshot 快照
+    :param args: 查询参数字典
+    :return: (x0, y0, x1, y1, max_nodes, grid)，参数格式错误时抛出 ValueError
+    """
+    inf = float('inf')
+    x0 = float(args.get('x0', -inf))
+    y0 = float(args.get('y0', -inf))
+    x1 = float(args.get('x1', inf))
+    y1 = float(args.get('y1', inf))
+    max_nodes = int(args.get('max_nodes', MAX_NODES))
+    grid = int(args.get('grid', 64))
+    if math.isinf(x1 - x0) or math.isinf(y1 - y0):
+        if len(snapshot):
+            low, high = snapshot.pos.min(axis=0), snapshot.pos.max(axis=0)
+            x0, y0 = max(x0, float(low[0])), max(y0, float(low[1]))
+            x1, y1 = min(x1, float(high[0])), min(y1, float(high[1]))
+    return x0, y0, x1, y1, max_nodes, grid
+
+
+class ViewportCache:
+    """
+    只为最新快照建立一次视口索引，所有查询者共用；快照更新后在下一次查询时重建
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self, snapshot):
+        """
+        :param snapshot: WorldSnapshot 快照
+        :return: 该快照的 ViewportIndex
+        """
+        with self._lock:
+            if self._snapshot is not snapshot:
+                self._index = ViewportIndex(snapshot)
+                self._snapshot = snapshot
+            return self._index